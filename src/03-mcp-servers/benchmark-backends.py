@@ -0,0 +1,114 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from data_functions import DataLayer, Customer, Order, Product, ProductInventory
+from data_columnar import ColumnarDataLayer
+from data_sqlite import SqliteDataLayer
+from data_mapped import MappedDataLayer, write_snapshot
+
+# Compares point lookup and update throughput of the in-memory, columnar, sqlite and mapped backends.
+#
+#   python benchmark-backends.py --orders 100000 --seconds 2
+
+def generate_data(orders: int, customers: int, products: int):
+    customer_list = [
+        Customer(
+            customer_id=f"CUST{i}",
+            customer_name=f"Customer {i}",
+            customer_address=f"Address {i}",
+            customer_phone=f"Phone {i}",
+            customer_email=f"customer{i}@example.com",
+            customer_discount=[]
+        ) for i in range(customers)
+    ]
+    product_list = [
+        Product(
+            product_id=f"PROD{j}",
+            product_name=f"Product {j}",
+            list_price=10.0 + j,
+            description=f"Description for Product {j}",
+            features=["Feature 1", "Feature 2"]
+        ) for j in range(products)
+    ]
+    order_list = [
+        Order(
+            customer_id=f"CUST{i % customers}",
+            order_id=f"ORD-{i}",
+            order_date="2023-10-01",
+            order_status="Pending",
+            fill_date="2023-10-02",
+            fill_strategy="Standard",
+            order_items=[product_list[(i + k) % products] for k in range(3)]
+        ) for i in range(orders)
+    ]
+    inventory_list = [
+        ProductInventory(
+            product_id=f"PROD{j % products}",
+            product_name=f"Product {j % products}",
+            volume=j % 50,
+            location=["USEast", "EuropeWest", "AsiaEast"][j % 3]
+        ) for j in range(products * 6)
+    ]
+    return customer_list, order_list, inventory_list
+
+def throughput(name: str, seconds: float, operation) -> float:
+    rng = random.Random(42)
+    count = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            operation(rng)
+        count += 100
+    ops = count / (time.perf_counter() - start)
+    print(f"  {name:<28} {ops:>12,.0f} ops/s")
+    return ops
+
+def fill(data_layer: DataLayer, data) -> DataLayer:
+    customers, orders, inventory = data
+    data_layer.customers = customers
+    data_layer.orders = orders
+    data_layer.inventory = inventory
+    data_layer.suppliers = []
+    start = time.perf_counter()
+    data_layer.rebuild_indexes()
+    print(f"{type(data_layer).__name__} (indexed in {time.perf_counter() - start:.1f}s)")
+    return data_layer
+
+def mapped(data, snapshot_file: str) -> MappedDataLayer:
+    write_snapshot(fill(DataLayer(), data), snapshot_file)
+    start = time.perf_counter()
+    data_layer = MappedDataLayer(snapshot_file=snapshot_file)
+    print(f"MappedDataLayer (opened in {time.perf_counter() - start:.3f}s)")
+    return data_layer
+
+def run(data_layer: DataLayer, args):
+    throughput("get_order_by_id", args.seconds, lambda rng: data_layer.get_order_by_id(f"ORD-{rng.randrange(args.orders)}"))
+    throughput("get_customer_by_name", args.seconds, lambda rng: data_layer.get_customer_by_name(f"Customer {rng.randrange(args.customers)}"))
+    throughput("get_orders_by_customer_id", args.seconds, lambda rng: data_layer.get_orders_by_customer_id(f"CUST{rng.randrange(args.customers)}"))
+    throughput("get_inventory_by_product_id", args.seconds, lambda rng: data_layer.get_inventory_by_product_id(f"PROD{rng.randrange(args.products)}"))
+    status = ["Pending", "Shipped", "Delivered"]
+
+    def update(rng):
+        order_id = f"ORD-{rng.randrange(args.orders)}"
+        order = data_layer.get_order_by_id(order_id)
+        data_layer.update_order(order_id, order.model_copy(update={"order_status": rng.choice(status)}))
+
+    throughput("update_order", args.seconds, update)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--seconds", type=float, default=2)
+    args = parser.parse_args()
+
+    data = generate_data(args.orders, args.customers, args.products)
+    with tempfile.TemporaryDirectory() as tmp:
+        for data_layer in [DataLayer(), ColumnarDataLayer(), SqliteDataLayer(database_file=os.path.join(tmp, "benchmark.db"))]:
+            run(fill(data_layer, data), args)
+        run(mapped(data, os.path.join(tmp, "benchmark.snapshot")), args)
@@ -0,0 +1,73 @@
+import argparse
+import time
+
+from pydantic import TypeAdapter
+
+from data_functions import Order, Product
+from response_encoding import brotli, msgpack, compress, json_to_msgpack
+
+# Compares bytes on the wire and encode time of the response representations served by server-openapi.py.
+# Encode time includes serializing the models; cached endpoints pay it once per data version.
+#
+#   python benchmark-encoding.py --products 5000 --orders 2000
+
+def generate_products(count: int) -> list[Product]:
+    return [
+        Product(
+            product_id=f"PROD{j}",
+            product_name=f"Product {j}",
+            list_price=round(10.0 + j * 0.37, 2),
+            description=f"Description for Product {j}, a durable item for everyday use",
+            features=["Feature 1", "Feature 2", f"Size {j % 5}"]
+        ) for j in range(count)
+    ]
+
+def generate_orders(count: int, products: list[Product]) -> list[Order]:
+    return [
+        Order(
+            customer_id=f"CUST{i % 100}",
+            order_id=f"ORD-{i}",
+            order_date="2023-10-01",
+            order_status=["Pending", "Shipped", "Delivered"][i % 3],
+            fill_date="2023-10-02",
+            fill_strategy="Standard",
+            order_items=[products[(i + k) % len(products)] for k in range(3)]
+        ) for i in range(count)
+    ]
+
+def representations():
+    """Yields the name and encoder of every representation the installed libraries support."""
+    yield "json", lambda json_body: json_body
+    for level in (1, 6, 9):
+        yield f"json + gzip {level}", lambda json_body, level=level: compress(json_body, "gzip", {"gzip": level})
+    if brotli is not None:
+        for quality in (4, 9):
+            yield f"json + br {quality}", lambda json_body, quality=quality: compress(json_body, "br", {"br": quality})
+    if msgpack is not None:
+        yield "msgpack", json_to_msgpack
+        yield "msgpack + gzip 6", lambda json_body: compress(json_to_msgpack(json_body), "gzip", {"gzip": 6})
+        if brotli is not None:
+            yield "msgpack + br 4", lambda json_body: compress(json_to_msgpack(json_body), "br", {"br": 4})
+
+def measure(name: str, items: list, adapter: TypeAdapter, repeat: int):
+    print(f"{name} ({len(items)} items)")
+    json_body = adapter.dump_json(items)
+    for representation, encode in representations():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            body = encode(adapter.dump_json(items))
+        elapsed_ms = (time.perf_counter() - start) / repeat * 1000
+        print(f"  {representation:<18} {len(body):>10,} bytes {len(body) / len(json_body):6.1%} {elapsed_ms:9.2f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if brotli is None or msgpack is None:
+        print("brotli or msgpack is not installed, skipping their representations")
+    products = generate_products(args.products)
+    measure("/products/all", products, TypeAdapter(list[Product]), args.repeat)
+    measure("/orders/batch", generate_orders(args.orders, products), TypeAdapter(list[Order]), args.repeat)
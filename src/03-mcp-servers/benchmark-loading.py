@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from data_functions import DataLayer
+from data_columnar import ColumnarDataLayer
+from data_mapped import MappedDataLayer, write_snapshot
+
+# Compares the row by row loader with the single pass fast loader and the streaming loader,
+# streaming into the columnar backend, and opening a mapped binary snapshot of the same orders.
+# Every run happens in a fresh interpreter so the peak RSS is not shared between modes.
+#
+#   python benchmark-loading.py --orders 200000
+
+MODES = ["default", "fast", "stream", "columnar", "mapped"]
+
+def generate_orders_file(file_name: str, count: int):
+    orders = [
+        {
+            "customer_id": f"CUST{i % 1000}",
+            "order_id": f"ORD-{i}",
+            "order_date": "2023-10-01",
+            "order_status": "Pending",
+            "fill_date": "2023-10-02",
+            "fill_strategy": "Standard",
+            "order_items": [
+                {
+                    "product_id": f"PROD{j}",
+                    "product_name": f"Product {j}",
+                    "list_price": 10.0 + j,
+                    "description": f"Description for Product {j}",
+                    "features": ["Feature 1", "Feature 2"]
+                } for j in range(3)
+            ]
+        } for i in range(count)
+    ]
+    with open(file_name, 'w') as f:
+        json.dump({"orders": orders}, f)
+
+def peak_rss_mb() -> float:
+    # ru_maxrss of a child starts at the peak RSS of its parent on Linux, VmHWM starts fresh
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure(file_name: str, mode: str):
+    start = time.perf_counter()
+    if mode == "mapped":
+        data_layer = MappedDataLayer(snapshot_file=file_name + ".snapshot")
+        data_layer.get_order_by_id("ORD-0")
+    else:
+        data_layer = ColumnarDataLayer() if mode == "columnar" else DataLayer()
+        data_layer.load_order_from_json(file_name, fast=(mode == "fast"), stream=(mode in ["stream", "columnar"]))
+    elapsed = time.perf_counter() - start
+    peak_mb = peak_rss_mb()
+    print(json.dumps({"mode": mode, "seconds": elapsed, "peak_rss_mb": peak_mb}))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--measure", choices=MODES)
+    parser.add_argument("--write-snapshot", action="store_true")
+    parser.add_argument("--file")
+    args = parser.parse_args()
+
+    if args.write_snapshot:
+        source = ColumnarDataLayer()
+        source.load_order_from_json(args.file, stream=True)
+        write_snapshot(source, args.file + ".snapshot")
+        sys.exit(0)
+
+    if args.measure:
+        measure(args.file, args.measure)
+        sys.exit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        file_name = os.path.join(tmp, "orders.json")
+        generate_orders_file(file_name, args.orders)
+        print(f"{args.orders} orders, {os.path.getsize(file_name) / 1024 / 1024:.1f} MB of JSON")
+        start = time.perf_counter()
+        subprocess.run([sys.executable, __file__, "--write-snapshot", "--file", file_name], capture_output=True, check=True)
+        print(f"Snapshot written in {time.perf_counter() - start:.2f}s, {os.path.getsize(file_name + '.snapshot') / 1024 / 1024:.1f} MB")
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, __file__, "--measure", mode, "--file", file_name],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:>8}: {result['seconds']:.2f}s, peak RSS {result['peak_rss_mb']:.0f} MB")
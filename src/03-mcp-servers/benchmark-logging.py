@@ -0,0 +1,78 @@
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Throughput of server-openapi.py under the logging configurations of logging_setup.py.
+# "synchronous" is the default and writes every record in the request thread, "queue" hands them to
+# the background writer that LOG_QUEUE_SIZE enables.
+#
+#   python benchmark-logging.py --clients 4 --seconds 10
+
+CONFIGURATIONS = {
+    "synchronous": {"LOG_QUEUE_SIZE": "0", "ACCESS_LOG_SAMPLE": "1"},
+    "synchronous, 1% access log": {"LOG_QUEUE_SIZE": "0", "ACCESS_LOG_SAMPLE": "0.01"},
+    "queue": {"LOG_QUEUE_SIZE": "10000", "ACCESS_LOG_SAMPLE": "1"},
+    "queue, 1% access log": {"LOG_QUEUE_SIZE": "10000", "ACCESS_LOG_SAMPLE": "0.01"},
+    "warnings only": {"LOG_LEVEL": "WARNING", "ACCESS_LOG_SAMPLE": "0"},
+}
+PATHS = ["/customers/id/CUST1", "/orders/customer/CUST1", "/inventory/PROD0/stock", "/customers/name/Unknown"]
+
+def client(port: int, seconds: float, results: multiprocessing.Queue):
+    connection = http.client.HTTPConnection("localhost", port)
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        connection.request("GET", PATHS[count % len(PATHS)])
+        connection.getresponse().read()
+        count += 1
+    results.put(count)
+
+def wait_until_ready(port: int, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("localhost", port, timeout=1)
+            connection.request("GET", PATHS[0])
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server on port {port} did not start")
+
+def run(name: str, settings: dict, args, log_file: str) -> float:
+    with open(log_file, "w") as log:
+        server = subprocess.Popen(
+            [sys.executable, "run-workers.py", "server-openapi:app", "--port", str(args.port), "--workers", "1"],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=dict(os.environ, **settings), stdout=log, stderr=log,
+        )
+        try:
+            wait_until_ready(args.port)
+            results = multiprocessing.Queue()
+            clients = [multiprocessing.Process(target=client, args=(args.port, args.seconds, results)) for _ in range(args.clients)]
+            for process in clients:
+                process.start()
+            count = sum(results.get() for _ in clients)
+            for process in clients:
+                process.join()
+        finally:
+            server.terminate()
+            server.wait()
+    throughput = count / args.seconds
+    print(f"  {name:<22} {throughput:>10,.0f} req/s   {os.path.getsize(log_file) / 1024:>8,.0f} KB logged")
+    return throughput
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, settings in CONFIGURATIONS.items():
+            run(name, settings, args, os.path.join(tmp, "server.log"))
@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from fastmcp import Client
+from fastmcp.client.transports import SSETransport, StreamableHttpTransport
+
+# Load test of the MCP servers: starts a server on localhost, opens N client sessions at once and lets
+# every session replay a weighted mix of tool calls and resource reads for a fixed time. Reports the
+# session setup time, the throughput, latency percentiles and the memory of the server processes.
+#
+#   python benchmark-mcp.py server-mcp-http:http_app --sessions 1 10 50 --seconds 10
+#   python benchmark-mcp.py server-mcp-sse-time:sse_app --sessions 10
+#
+# The sessions are spread over --processes client processes, give them their own cores where possible
+# so the clients are not the bottleneck. --url measures a server that is already running instead,
+# its memory is not reported then.
+
+MIXES = {
+    "ecommerce": [
+        {"tool": "get_customers_by_ids", "arguments": {"customer_ids": ["CUST1", "CUST2"]}, "weight": 4},
+        {"tool": "search_customers", "arguments": {"query": "smith", "limit": 5}, "weight": 2},
+        {"tool": "get_products_page", "arguments": {"limit": 20}, "weight": 2},
+        {"tool": "get_orders_page", "arguments": {"customer_id": "CUST1", "limit": 10}, "weight": 1},
+        {"resource": "resource://inventory/stock", "weight": 2},
+        {"resource": "resource://products/products", "weight": 1},
+    ],
+    "time": [
+        {"tool": "get_current_user", "arguments": {}, "weight": 2},
+        {"tool": "get_current_location", "arguments": {"username": "Dennis"}, "weight": 2},
+        {"tool": "get_current_time", "arguments": {"location": "Europe/Berlin"}, "weight": 3},
+        {"resource": "config://version", "weight": 1},
+    ],
+}
+
+# The endpoint and default mix of each app
+APPS = {
+    "server-mcp-sse-customers:sse_app": ("/sse", "ecommerce"),
+    "server-mcp-sse-time:sse_app": ("/sse", "time"),
+    "server-mcp-http:http_app": ("/mcp", "ecommerce"),
+    "server-mcp-ecommerce:app": ("/mcp", "ecommerce"),
+}
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+def operation_name(operation: dict) -> str:
+    return operation["tool"] if "tool" in operation else operation["resource"]
+
+class StartGate:
+    """Lets the sessions start their calls together once every session is set up or failed to set up."""
+
+    def __init__(self, sessions: int):
+        self.pending = sessions
+        self.event = asyncio.Event()
+
+    def arrive(self):
+        self.pending -= 1
+        if self.pending == 0:
+            self.event.set()
+
+async def run_session(url: str, mix: list[dict], seed: int, gate: StartGate, seconds: float, result: dict):
+    transport = SSETransport(url) if url.endswith("/sse") else StreamableHttpTransport(url)
+    rng = random.Random(seed)
+    weights = [operation.get("weight", 1) for operation in mix]
+    arrived = False
+    start = time.perf_counter()
+    try:
+        async with Client(transport) as client:
+            result["setup"].append(time.perf_counter() - start)
+            arrived = True
+            gate.arrive()
+            await gate.event.wait()
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                operation = rng.choices(mix, weights)[0]
+                start = time.perf_counter()
+                try:
+                    if "tool" in operation:
+                        await client.call_tool(operation["tool"], operation.get("arguments", {}))
+                    else:
+                        await client.read_resource(operation["resource"])
+                except Exception:
+                    result["errors"] += 1
+                    continue
+                result["latencies"].setdefault(operation_name(operation), []).append(time.perf_counter() - start)
+    except Exception:
+        result["setup_errors" if not arrived else "errors"] += 1
+        # A session that failed to start must not keep the others waiting
+        if not arrived:
+            gate.arrive()
+
+async def run_sessions(url: str, mix: list[dict], sessions: int, seconds: float, seed: int) -> dict:
+    result = {"setup": [], "latencies": {}, "errors": 0, "setup_errors": 0}
+    gate = StartGate(sessions)
+    await asyncio.gather(*(run_session(url, mix, seed + i, gate, seconds, result) for i in range(sessions)))
+    return result
+
+def client_process(url: str, mix: list[dict], sessions: int, seconds: float, seed: int, results: multiprocessing.Queue):
+    results.put(asyncio.run(run_sessions(url, mix, sessions, seconds, seed)))
+
+def process_tree_rss(pid: int) -> int:
+    """
+    Sums the resident memory of a process and all its descendants from /proc.
+    :param pid (int): The root process.
+    :return: The resident memory in bytes, 0 where /proc is not available.
+    :rtype: int
+    """
+    children = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return 0
+    for entry in entries:
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The parent pid is the second field after the command name, which may contain spaces
+                    parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            pass
+    return total
+
+class MemorySampler:
+    """Samples the memory of the server processes in the background and keeps the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak = max(self.peak, process_tree_rss(self.pid))
+
+    def __enter__(self):
+        self.peak = process_tree_rss(self.pid)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+
+def wait_until_listening(port: int, server: subprocess.Popen, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Server exited with code {server.returncode}")
+        try:
+            socket.create_connection(("localhost", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Server on port {port} did not start")
+
+def measure(url: str, mix: list[dict], sessions: int, args) -> dict:
+    processes = max(1, min(args.processes, sessions))
+    results = multiprocessing.Queue()
+    clients = [
+        multiprocessing.Process(target=client_process, args=(url, mix, sessions // processes + (i < sessions % processes), args.seconds, i * 100_000, results))
+        for i in range(processes)
+    ]
+    for process in clients:
+        process.start()
+    combined = {"setup": [], "latencies": {}, "errors": 0, "setup_errors": 0}
+    for _ in clients:
+        result = results.get()
+        combined["setup"] += result["setup"]
+        combined["errors"] += result["errors"]
+        combined["setup_errors"] += result["setup_errors"]
+        for name, latencies in result["latencies"].items():
+            combined["latencies"].setdefault(name, []).extend(latencies)
+    for process in clients:
+        process.join()
+    return combined
+
+def report(sessions: int, result: dict, seconds: float, rss_idle: int, rss_peak: int, by_operation: bool):
+    setup = sorted(result["setup"])
+    latencies = sorted(latency for values in result["latencies"].values() for latency in values)
+    memory = f"   rss {rss_idle / 2**20:6.1f} -> {rss_peak / 2**20:6.1f} MB" if rss_peak else ""
+    print(
+        f"  {sessions:>4} sessions   setup p50 {percentile(setup, 0.5) * 1000:7.1f} ms p99 {percentile(setup, 0.99) * 1000:7.1f} ms"
+        f"   {len(latencies) / seconds:8,.0f} calls/s   p50 {percentile(latencies, 0.5) * 1000:6.2f} ms"
+        f" p90 {percentile(latencies, 0.9) * 1000:6.2f} ms p99 {percentile(latencies, 0.99) * 1000:6.2f} ms"
+        f"   errors {result['errors'] + result['setup_errors']}{memory}"
+    )
+    if by_operation:
+        for name, values in sorted(result["latencies"].items()):
+            values.sort()
+            print(f"         {name:<36} {len(values):>8} calls   p50 {percentile(values, 0.5) * 1000:6.2f} ms p99 {percentile(values, 0.99) * 1000:6.2f} ms")
+
+def run(app: str, sessions: int, mix: list[dict], path: str, env: dict, args):
+    url = args.url
+    server = None
+    if url is None:
+        server = subprocess.Popen(
+            [sys.executable, "run-workers.py", app, "--port", str(args.port), "--workers", str(args.workers)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        url = f"http://localhost:{args.port}{path}"
+    try:
+        if server is None:
+            result = measure(url, mix, sessions, args)
+            report(sessions, result, args.seconds, 0, 0, args.by_operation)
+            return
+        wait_until_listening(args.port, server)
+        with MemorySampler(server.pid) as memory:
+            rss_idle = memory.peak
+            result = measure(url, mix, sessions, args)
+        report(sessions, result, args.seconds, rss_idle, memory.peak, args.by_operation)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("app", nargs="?", default="server-mcp-http:http_app", help=f"One of {', '.join(APPS)}")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--processes", type=int, default=1, help="Client processes the sessions are spread over")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes, only for the streamable HTTP app")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--path", help="Endpoint of the app, /sse or /mcp, defaults to the one of the app")
+    parser.add_argument("--url", help="Measure a server that is already running, e.g. http://localhost:8000/sse")
+    parser.add_argument("--mix", help="JSON file with a list of {\"tool\": name, \"arguments\": {...}, \"weight\": n} or {\"resource\": uri, \"weight\": n}")
+    parser.add_argument("--by-operation", action="store_true", help="Also report the latencies of every tool and resource")
+    args = parser.parse_args()
+
+    path, mix_name = APPS.get(args.app, ("/mcp", "ecommerce"))
+    path = args.path or path
+    if args.mix is not None:
+        with open(args.mix) as f:
+            mix = json.load(f)
+    else:
+        mix = MIXES[mix_name]
+
+    print(f"{args.url or args.app} on {os.cpu_count()} cores, {args.processes} client processes, {args.seconds:.0f}s per run")
+    with tempfile.TemporaryDirectory() as tmp:
+        # A fresh snapshot and order log, so the runs do not change the data directory
+        env = dict(os.environ, SNAPSHOT_FILE=os.path.join(tmp, "benchmark.snapshot"), ORDER_LOG_FILE=os.path.join(tmp, "orders.wal"))
+        for sessions in args.sessions:
+            run(args.app, sessions, mix, path, env, args)
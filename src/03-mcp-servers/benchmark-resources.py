@@ -0,0 +1,50 @@
+import argparse
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+
+from data_functions import load_data_layer
+from ecommerce_mcp import create_mcp
+
+# Measures resource reads of the e-commerce MCP server with and without the resource cache.
+# The reads call the handler the server runs for resources/read, so the times leave out the
+# transport and the client, which cost the same with and without the cache.
+#
+#   python benchmark-resources.py --reads 200
+
+RESOURCES = [
+    "resource://products/products",
+    "resource://discounts/discount",
+    "resource://inventory/PROD0/productinventory",
+    "resource://inventory/stock",
+]
+
+async def measure(mcp, reads: int) -> dict[str, float]:
+    times = {}
+    for uri in RESOURCES:
+        await mcp._mcp_read_resource(uri)
+        start = time.perf_counter()
+        for _ in range(reads):
+            await mcp._mcp_read_resource(uri)
+        times[uri] = (time.perf_counter() - start) / reads * 1_000_000
+    metrics = await mcp._mcp_read_resource("resource://metrics/cache")
+    print("  " + " ".join(metrics[0].content.split()))
+    return times
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    load_dotenv()
+    data_layer = load_data_layer(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+    results = {}
+    for name, size in (("uncached", "0"), ("cached", "1024")):
+        os.environ["MCP_CACHE_SIZE"] = size
+        print(name)
+        results[name] = asyncio.run(measure(create_mcp(data_layer), args.reads))
+
+    print(f"{'resource':<46} {'uncached':>12} {'cached':>12}")
+    for uri in RESOURCES:
+        print(f"{uri:<46} {results['uncached'][uri]:>9,.1f} us {results['cached'][uri]:>9,.1f} us")
@@ -0,0 +1,51 @@
+import argparse
+import random
+import time
+
+from data_functions import DataLayer, Customer
+
+# Measures build time and query latency of the customer name search index.
+#
+#   python benchmark-search.py --customers 1000000
+
+FIRST_NAMES = ["Alice", "Bob", "Carla", "David", "Elena", "Frank", "Grace", "Hannah", "Isaac", "John",
+               "Kate", "Lisa", "Mark", "Nina", "Oliver", "Peter", "Rosa", "Sarah", "Thomas", "Wilma"]
+QUERIES = ["alice johnson", "Alice J.", "alice jonson", "johnson", "jo", "Smith", "grace wilson", "zzzz"]
+
+def generate_customers(count: int, seed: int = 42) -> list[Customer]:
+    rng = random.Random(seed)
+    # A long tail of last names, like real customer data
+    last_names = [f"{stem}{suffix}" for stem in ["Smith", "John", "Will", "Brown", "Garc", "Mill", "Dav", "Rodr", "Mart", "Tayl"]
+                  for suffix in ["", "son", "er", "s", "ez", "ia", "ington", "ford", "ley", "man"]]
+    last_names += [f"Name{i}" for i in range(max(1, count // 20))]
+    return [
+        Customer(
+            customer_id=f"CUST{i}",
+            customer_name=f"{rng.choice(FIRST_NAMES)} {last_names[min(int(rng.paretovariate(1.2)) - 1, len(last_names) - 1)]}",
+            customer_address=f"Address {i}",
+            customer_phone=f"Phone {i}",
+            customer_email=f"customer{i}@example.com",
+            customer_discount=[]
+        ) for i in range(count)
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--customers", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    data_layer = DataLayer()
+    data_layer.customers = generate_customers(args.customers)
+    start = time.perf_counter()
+    data_layer.rebuild_indexes()
+    print(f"{args.customers} customers indexed in {time.perf_counter() - start:.1f}s")
+
+    for query in QUERIES:
+        matches = data_layer.search_customers(query)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            data_layer.search_customers(query)
+        elapsed_ms = (time.perf_counter() - start) / args.repeat * 1000
+        best = matches[0].customer.customer_name if matches else "-"
+        print(f"  {query!r:<16} {elapsed_ms:8.3f} ms  {len(matches)} matches, best: {best}")
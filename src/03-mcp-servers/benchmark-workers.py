@@ -0,0 +1,105 @@
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# Load test of run-workers.py: serves an app with 1, 2, 4, ... workers and measures the throughput
+# of a read-heavy mix of requests from several client processes. The clients run on the same machine,
+# so give the container about twice the cores of the largest worker count to see the servers scale.
+#
+#   python benchmark-workers.py --workers 1 2 4 --clients 8 --seconds 10
+
+REQUESTS = [
+    ("GET", "/orders/customer/CUST1", None),
+    ("GET", "/customers/id/CUST1", None),
+    ("GET", "/products/all", None),
+    ("GET", "/stock/all", None),
+    ("GET", "/inventory/PROD0", None),
+]
+
+def client(port: int, seconds: float, update_every: int, results: multiprocessing.Queue):
+    connection = http.client.HTTPConnection("localhost", port)
+    order = json.loads(request(connection, "GET", "/orders/customer/CUST1", None))[0]
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    count = 0
+    while time.perf_counter() < deadline:
+        if update_every and count % update_every == 0:
+            order["order_status"] = f"Status {count}"
+            method, path, body = "POST", "/order/update", json.dumps(order)
+        else:
+            method, path, body = REQUESTS[count % len(REQUESTS)]
+        start = time.perf_counter()
+        request(connection, method, path, body)
+        latencies.append(time.perf_counter() - start)
+        count += 1
+    results.put(latencies)
+
+def request(connection: http.client.HTTPConnection, method: str, path: str, body: str | None) -> bytes:
+    connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    data = response.read()
+    if response.status != 200:
+        raise ValueError(f"{method} {path} returned {response.status}")
+    return data
+
+def wait_until_ready(port: int, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("localhost", port, timeout=1)
+            request(connection, "GET", "/customers/id/CUST1", None)
+            return
+        except (OSError, ValueError):
+            time.sleep(0.2)
+    raise TimeoutError(f"Server on port {port} did not start")
+
+def run(workers: int, args, env: dict) -> float:
+    server = subprocess.Popen(
+        [sys.executable, "run-workers.py", args.app, "--port", str(args.port), "--workers", str(workers)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(args.port)
+        results = multiprocessing.Queue()
+        clients = [multiprocessing.Process(target=client, args=(args.port, args.seconds, args.update_every, results))
+                   for _ in range(args.clients)]
+        for process in clients:
+            process.start()
+        latencies = sorted(latency for _ in clients for latency in results.get())
+        for process in clients:
+            process.join()
+    finally:
+        server.terminate()
+        server.wait()
+    throughput = len(latencies) / args.seconds
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"  {workers:>3} workers {throughput:>10,.0f} req/s   p50 {p50:6.2f} ms   p99 {p99:6.2f} ms")
+    return throughput
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--app", default="server-openapi:app")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--update-every", type=int, default=20, help="Send an order update every n requests, 0 for none")
+    args = parser.parse_args()
+
+    print(f"{args.app} on {os.cpu_count()} cores, {args.clients} clients")
+    with tempfile.TemporaryDirectory() as tmp:
+        # A fresh snapshot and order log, so the runs do not change the data directory
+        env = dict(os.environ, SNAPSHOT_FILE=os.path.join(tmp, "benchmark.snapshot"), ORDER_LOG_FILE=os.path.join(tmp, "orders.wal"))
+        baseline = None
+        for workers in args.workers:
+            throughput = run(workers, args, env)
+            baseline = baseline or throughput
+            print(f"      speedup {throughput / baseline:.2f}x")
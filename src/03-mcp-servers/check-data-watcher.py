@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+from data_functions import DataLayer, DataWatcher
+from data_sqlite import SqliteDataLayer
+
+# Checks that the data watcher survives broken data files: every malformed customers.json must be
+# rejected while the current data keeps serving, and a valid file written afterwards must still be loaded.
+#
+#   python check-data-watcher.py
+
+MALFORMED = [
+    "{\"customers\": [",
+    json.dumps({"clients": []}),
+    json.dumps([]),
+    json.dumps({"customers": {"CUST1": {}}}),
+    json.dumps({"customers": [1, 2]}),
+    json.dumps({"customers": [{"customer_id": "CUST1"}]}),
+]
+
+def customer(i: int) -> dict:
+    return {
+        "customer_id": f"CUST{i}",
+        "customer_name": f"Customer {i}",
+        "customer_address": f"Address {i}",
+        "customer_phone": f"Phone {i}",
+        "customer_email": f"customer{i}@example.com",
+        "customer_discount": [],
+    }
+
+def write(data_path: str, text: str):
+    # Written next to the file and renamed, so the watcher never sees half a file
+    tmp = os.path.join(data_path, "customers.json.tmp")
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, os.path.join(data_path, "customers.json"))
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+def check(data_layer: DataLayer, data_path: str) -> list[str]:
+    errors = []
+    write(data_path, json.dumps({"customers": [customer(1)]}))
+    data_layer.load_customer_from_json(os.path.join(data_path, "customers.json"))
+    watcher = DataWatcher(data_layer, data_path, interval=0.05)
+    watcher.start()
+    try:
+        for count, text in enumerate(MALFORMED, start=2):
+            write(data_path, text)
+            # Two checks see the file unchanged, then it is reloaded and rejected
+            time.sleep(0.3)
+            if not watcher.thread.is_alive():
+                errors.append(f"Watcher thread died on {text[:40]!r}")
+                break
+            if data_layer.get_customer_by_id("CUST1") is None:
+                errors.append(f"Current data lost on {text[:40]!r}")
+            # A valid file after the broken one is picked up
+            write(data_path, json.dumps({"customers": [customer(i) for i in range(1, count + 1)]}))
+            if not wait_for(lambda: data_layer.get_customer_by_id(f"CUST{count}") is not None):
+                errors.append(f"Valid file after {text[:40]!r} was not reloaded")
+    finally:
+        watcher.stop()
+    return errors
+
+if __name__ == "__main__":
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = [DataLayer(), SqliteDataLayer(database_file=os.path.join(tmp, "check.db"))]
+        for data_layer in backends:
+            data_path = os.path.join(tmp, type(data_layer).__name__)
+            os.makedirs(data_path)
+            errors = check(data_layer, data_path)
+            print(f"{type(data_layer).__name__}: {len(MALFORMED)} malformed files, {len(errors)} errors")
+            for error in errors:
+                print(f"  {error}")
+            failed = failed or bool(errors)
+    sys.exit(1 if failed else 0)
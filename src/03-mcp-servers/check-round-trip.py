@@ -0,0 +1,168 @@
+import json
+import os
+import sys
+import tempfile
+
+from data_functions import DataLayer, Order, Supplier
+from data_mapped import MappedDataLayer, write_snapshot
+from data_sqlite import SqliteDataLayer
+
+# Checks that models with unset optional fields survive being written and read back, e.g. an order
+# without fill_strategy and order_items or a customer without discounts. The models reject null for these
+# fields, so they must be left out.
+#
+#   python check-round-trip.py
+
+def bare_order(order: Order) -> Order:
+    return Order(
+        customer_id=order.customer_id,
+        order_id=order.order_id,
+        order_date=order.order_date,
+        order_status="bare",
+        fill_date=order.fill_date,
+    )
+
+def bare_source() -> DataLayer:
+    """The mock data with models that leave their optional fields unset: a customer, a supplier and an order."""
+    source = DataLayer()
+    source.fill_data()
+    source.customers[0] = source.customers[0].model_copy(update={"customer_discount": None})
+    source.suppliers.append(Supplier(supplier_id="BARE", supplier_name="Bare", contract_id="C0", contract_name="None"))
+    source.orders[0] = bare_order(source.orders[0])
+    source.rebuild_indexes()
+    return source
+
+def read_back(data_layer: DataLayer, source: DataLayer) -> list[str]:
+    errors = []
+    try:
+        if data_layer.get_customer_by_id(source.customers[0].customer_id) != source.customers[0]:
+            errors.append("Customer without discounts differs after reading it back")
+        if data_layer.get_supplier_by_id("BARE") != source.get_supplier_by_id("BARE"):
+            errors.append("Supplier without products and discounts differs after reading it back")
+        if data_layer.get_order_by_id(source.orders[0].order_id) != source.orders[0]:
+            errors.append("Order without fill_strategy and order_items differs after reading it back")
+        if list(data_layer.orders) != list(source.orders):
+            errors.append("Orders differ after reading them back")
+    except ValueError as e:
+        errors.append(f"Reading back models with unset fields failed: {e}")
+    return errors
+
+def filled_data_layer(cls=DataLayer, **kwargs) -> DataLayer:
+    source = DataLayer()
+    source.fill_data()
+    data_layer = cls(**kwargs)
+    data_layer.suppliers = source.suppliers
+    data_layer.customers = source.customers
+    data_layer.orders = list(source.orders)
+    data_layer.inventory = source.inventory
+    data_layer.rebuild_indexes()
+    return data_layer
+
+def check_order_log(tmp: str) -> list[str]:
+    errors = []
+    log_file = os.path.join(tmp, "orders.wal")
+    snapshot_file = os.path.join(tmp, "orders.wal.snapshot.json")
+    data_layer = filled_data_layer()
+    data_layer.open_order_log(log_file, snapshot_file)
+    first, second = [order.order_id for order in data_layer.orders][:2]
+    # One update ends up in the snapshot, the other one in the log after it
+    data_layer.update_order(first, bare_order(data_layer.get_order_by_id(first)))
+    data_layer.snapshot_orders()
+    data_layer.update_order(second, bare_order(data_layer.get_order_by_id(second)))
+    expected = {order.order_id: order for order in data_layer.orders}
+    data_layer.close_order_log()
+
+    try:
+        reopened = filled_data_layer()
+        reopened.open_order_log(log_file, snapshot_file)
+        actual = {order.order_id: order for order in reopened.orders}
+        if actual != expected:
+            errors.append("Orders replayed from the snapshot and the log differ from the written ones")
+        reopened.close_order_log()
+    except ValueError as e:
+        errors.append(f"Replaying the snapshot and the log failed: {e}")
+
+    # A log written before unset fields were left out holds null for them
+    legacy_log = os.path.join(tmp, "legacy.wal")
+    with open(legacy_log, "w") as f:
+        f.write(json.dumps({"order_id": first, "order": bare_order(expected[first]).model_dump(mode="json")}) + "\n")
+    try:
+        legacy = filled_data_layer()
+        legacy.open_order_log(legacy_log, os.path.join(tmp, "legacy.wal.snapshot.json"))
+        if legacy.get_order_by_id(first) != expected[first]:
+            errors.append("Order replayed from a log with null fields differs from the written one")
+        legacy.close_order_log()
+    except ValueError as e:
+        errors.append(f"Replaying a log with null fields failed: {e}")
+    return errors
+
+def check_shared_order_log(tmp: str) -> list[str]:
+    errors = []
+    log_file = os.path.join(tmp, "shared.wal")
+    snapshot_file = os.path.join(tmp, "shared.wal.snapshot.json")
+    writer, follower = filled_data_layer(), filled_data_layer()
+    for data_layer in (writer, follower):
+        data_layer.open_order_log(log_file, snapshot_file, shared=True, follow_interval=3600)
+    first, second = [order.order_id for order in writer.orders][:2]
+    # A broken line, e.g. from another version of the server, followed by a valid update
+    with open(log_file, "a") as f:
+        f.write(json.dumps({"order_id": first, "order": {"order_id": first}}) + "\n")
+    try:
+        writer.update_order(second, bare_order(writer.get_order_by_id(second)))
+        follower.follow_order_log()
+        if follower.get_order_by_id(second) != writer.get_order_by_id(second):
+            errors.append("The update after a broken log entry was not applied")
+        if not follower.update_order(first, bare_order(follower.get_order_by_id(first))):
+            errors.append("Updating after a broken log entry failed")
+    except ValueError as e:
+        errors.append(f"A broken log entry blocks the shared log: {e}")
+    for data_layer in (writer, follower):
+        data_layer.close_order_log()
+    return errors
+
+def check_sqlite(tmp: str) -> list[str]:
+    source = bare_source()
+    data_layer = SqliteDataLayer(database_file=os.path.join(tmp, "check.db"))
+    data_layer.suppliers = source.suppliers
+    data_layer.customers = source.customers
+    data_layer.orders = list(source.orders)
+    data_layer.inventory = source.inventory
+    data_layer.rebuild_indexes()
+    errors = read_back(data_layer, source)
+    # An update stores the order again
+    second = source.orders[1].order_id
+    source.update_order(second, bare_order(source.get_order_by_id(second)))
+    data_layer.update_order(second, bare_order(data_layer.get_order_by_id(second)))
+    errors += read_back(data_layer, source)
+    data_layer.close()
+    return errors
+
+def check_mapped(tmp: str) -> list[str]:
+    source = bare_source()
+    snapshot_file = os.path.join(tmp, "check.snapshot")
+    write_snapshot(source, snapshot_file)
+    try:
+        data_layer = MappedDataLayer(snapshot_file=snapshot_file)
+    except ValueError as e:
+        return [f"Opening a snapshot with unset fields failed: {e}"]
+    errors = read_back(data_layer, source)
+    data_layer.close()
+    return errors
+
+CHECKS = {
+    "order log": check_order_log,
+    "shared order log": check_shared_order_log,
+    "sqlite": check_sqlite,
+    "mapped": check_mapped,
+}
+
+if __name__ == "__main__":
+    failed = False
+    for name, check in CHECKS.items():
+        with tempfile.TemporaryDirectory() as tmp:
+            errors = check(tmp)
+        print(f"{name}: {len(errors)} errors")
+        for error in errors:
+            print(f"  {error}")
+        failed = failed or bool(errors)
+    sys.exit(1 if failed else 0)
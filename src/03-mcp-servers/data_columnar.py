@@ -0,0 +1,281 @@
+from array import array
+from collections.abc import Sequence
+from itertools import islice
+from typing import Iterator
+from pydantic import PrivateAttr
+
+from data_functions import DataLayer, Order, Product, ProductInventory, replace_in_group, _check_page
+
+class StringTable:
+    """Interns strings into integer codes so columns can store them as plain ints."""
+
+    def __init__(self):
+        self.codes: dict[str | None, int] = {}
+        self.values: list[str | None] = []
+
+    def code(self, value: str | None) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def lookup(self, value: str | None) -> int | None:
+        return self.codes.get(value)
+
+class ProductTable:
+    """Stores each distinct line item product once and refers to it by index."""
+
+    def __init__(self):
+        self.codes: dict[tuple, int] = {}
+        self.products: list[Product] = []
+
+    def code(self, product: Product) -> int:
+        key = (product.product_id, product.product_name, product.list_price, product.description, tuple(product.features))
+        code = self.codes.get(key)
+        if code is None:
+            code = len(self.products)
+            self.codes[key] = code
+            self.products.append(product)
+        return code
+
+class InventoryColumns(Sequence):
+    """
+    Inventory rows stored as integer columns.
+    Product IDs, product names and locations are interned in a shared string table.
+    Indexing materializes a ProductInventory model. The rows of each product are indexed
+    together with the columns, so replacing the whole store swaps both at once.
+    """
+
+    def __init__(self, strings: StringTable):
+        self.strings = strings
+        self.product_id = array('I')
+        self.product_name = array('I')
+        self.location = array('I')
+        self.volume = array('q')
+        self.rows_by_product_id: dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.volume)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        values = self.strings.values
+        return ProductInventory.model_construct(
+            product_id=values[self.product_id[row]],
+            product_name=values[self.product_name[row]],
+            volume=self.volume[row],
+            location=values[self.location[row]],
+        )
+
+    def append(self, item: ProductInventory) -> int:
+        self.product_id.append(self.strings.code(item.product_id))
+        self.product_name.append(self.strings.code(item.product_name))
+        self.location.append(self.strings.code(item.location))
+        self.volume.append(item.volume)
+        row = len(self.volume) - 1
+        self.rows_by_product_id.setdefault(item.product_id, array('I')).append(row)
+        return row
+
+class OrderColumns:
+    """
+    Orders stored as integer columns.
+    Header fields are interned in a shared string table and line items are kept as
+    offsets into one array of product codes. Indexing by row materializes an Order model.
+    Rows are never changed in place: an update appends a new row and retires the old one,
+    so a reader holding a row number always sees a complete order. Iteration and len()
+    only cover the live rows. The rows are indexed by order ID and by customer together with
+    the columns, so swapping in a compacted store replaces the rows and their indexes at once.
+    """
+
+    HEADER_FIELDS = ("customer_id", "order_id", "order_date", "order_status", "fill_date", "fill_strategy")
+    # Retired rows are only compacted away in stores of at least this many rows
+    COMPACT_MIN_ROWS = 1024
+
+    def __init__(self, strings: StringTable, line_items: ProductTable):
+        self.strings = strings
+        self.line_items = line_items
+        self.headers = {field: array('I') for field in self.HEADER_FIELDS}
+        # item_start is -1 for orders without an order_items list
+        self.item_start = array('q')
+        self.item_count = array('I')
+        self.item_product = array('I')
+        self.live = bytearray()
+        self.live_count = 0
+        self.rows_by_order_id: dict[str, int] = {}
+        self.rows_by_customer_id: dict[str, dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return self.live_count
+
+    def __iter__(self) -> Iterator[Order]:
+        for row in range(len(self.live)):
+            if self.live[row]:
+                yield self[row]
+
+    def __getitem__(self, row: int) -> Order:
+        values = self.strings.values
+        fields = {field: values[column[row]] for field, column in self.headers.items()}
+        start = self.item_start[row]
+        if start >= 0:
+            products = self.line_items.products
+            fields["order_items"] = [products[code] for code in self.item_product[start:start + self.item_count[row]]]
+        else:
+            fields["order_items"] = None
+        return Order.model_construct(**fields)
+
+    def field_at(self, row: int, field: str) -> str | None:
+        return self.strings.values[self.headers[field][row]]
+
+    def append(self, order: Order) -> int:
+        for field, column in self.headers.items():
+            column.append(self.strings.code(getattr(order, field)))
+        if order.order_items is None:
+            self.item_start.append(-1)
+            self.item_count.append(0)
+        else:
+            self.item_start.append(len(self.item_product))
+            self.item_count.append(len(order.order_items))
+            self.item_product.extend(self.line_items.code(product) for product in order.order_items)
+        self.live.append(1)
+        self.live_count += 1
+        return len(self.live) - 1
+
+    def retire(self, row: int):
+        self.live[row] = 0
+        self.live_count -= 1
+
+    def needs_compaction(self) -> bool:
+        """
+        Checks whether retired rows make up more than half of the store, so that compacting
+        costs at most one copied row per update since the last compaction.
+        :return: True if the store should be compacted.
+        :rtype: bool
+        """
+        rows = len(self.live)
+        return rows >= self.COMPACT_MIN_ROWS and rows > 2 * self.live_count
+
+    def compacted(self) -> "OrderColumns":
+        """
+        Copies the live rows, in their order, into a new store and moves the indexes over to the new row numbers.
+        The store itself is left unchanged, so readers still using it are not disturbed.
+        :return: The compacted store.
+        :rtype: OrderColumns
+        """
+        store = OrderColumns(self.strings, self.line_items)
+        new_rows = {}
+        for row in range(len(self.live)):
+            if not self.live[row]:
+                continue
+            new_rows[row] = len(store.live)
+            for field, column in self.headers.items():
+                store.headers[field].append(column[row])
+            start = self.item_start[row]
+            if start >= 0:
+                store.item_start.append(len(store.item_product))
+                store.item_product.extend(self.item_product[start:start + self.item_count[row]])
+            else:
+                store.item_start.append(-1)
+            store.item_count.append(self.item_count[row])
+            store.live.append(1)
+        store.live_count = len(store.live)
+        store.rows_by_order_id = {order_id: new_rows[row] for order_id, row in self.rows_by_order_id.items()}
+        store.rows_by_customer_id = {
+            customer_id: {order_id: new_rows[row] for order_id, row in rows.items()}
+            for customer_id, rows in self.rows_by_customer_id.items()
+        }
+        return store
+
+class ColumnarDataLayer(DataLayer):
+    """
+    DataLayer that keeps inventory and orders, including their line items, in compact
+    array columns instead of pydantic objects. Models are only built when a row is returned
+    from one of the query methods, so the in-memory footprint is several times smaller.
+    `orders` and `inventory` hold the column stores, which can be iterated like the lists they replace.
+    Order updates leave retired rows behind, the order store is compacted once they outnumber the live rows.
+    """
+
+    _strings: StringTable = PrivateAttr(default_factory=StringTable)
+    _line_items: ProductTable = PrivateAttr(default_factory=ProductTable)
+
+    def _index_orders(self):
+        orders = self.orders or []
+        self._reset_order_index()
+        for order in orders:
+            self._append_order(order)
+
+    def _reset_order_index(self):
+        super()._reset_order_index()
+        self._line_items = ProductTable()
+        self._set_order_store(OrderColumns(self._strings, self._line_items))
+
+    def _set_order_store(self, orders: OrderColumns):
+        # The base class checks for existing orders through _order_positions
+        self.orders = orders
+        self._order_positions = orders.rows_by_order_id
+
+    def _append_order(self, order: Order):
+        row = self.orders.append(order)
+        if order.order_id not in self._order_positions:
+            self._order_positions[order.order_id] = row
+            self.orders.rows_by_customer_id.setdefault(order.customer_id, {})[order.order_id] = row
+
+    def _index_inventory(self):
+        inventory = self.inventory or []
+        self._reset_inventory_index()
+        for item in inventory:
+            self._append_inventory(item)
+
+    def _reset_inventory_index(self):
+        super()._reset_inventory_index()
+        self.inventory = InventoryColumns(self._strings)
+
+    def _append_inventory(self, item: ProductInventory):
+        self.inventory.append(item)
+        self._add_inventory_to_stock(item)
+
+    # Readers take the order store once and use its indexes, a compaction may swap in a new store meanwhile
+
+    def get_order_by_id(self, order_id: str) -> Order:
+        orders = self.orders
+        row = orders.rows_by_order_id.get(order_id)
+        if row is None:
+            return None
+        return orders[row]
+
+    def get_orders_by_customer_id(self, customer_id: str) -> list[Order]:
+        return list(self.iter_orders_by_customer_id(customer_id))
+
+    def iter_orders_by_customer_id(self, customer_id: str) -> Iterator[Order]:
+        orders = self.orders
+        for row in orders.rows_by_customer_id.get(customer_id, {}).values():
+            yield orders[row]
+
+    def get_orders_by_customer_id_page(self, customer_id: str, offset: int = 0, limit: int = 50) -> list[Order]:
+        _check_page(offset, limit)
+        orders = self.orders
+        rows = orders.rows_by_customer_id.get(customer_id, {}).values()
+        return [orders[row] for row in islice(rows, offset, offset + limit)]
+
+    def _apply_order_update(self, order_id: str, order_data: Order) -> bool:
+        row = self._order_positions.get(order_id)
+        if row is None or self._renames_onto_other_order(order_id, order_data):
+            return False
+        orders = self.orders
+        previous_customer_id = orders.field_at(row, "customer_id")
+        new_row = orders.append(order_data)
+        replace_in_group(orders.rows_by_customer_id, previous_customer_id, order_id, order_data.customer_id, order_data.order_id, new_row)
+        self._order_positions[order_data.order_id] = new_row
+        if order_id != order_data.order_id:
+            del self._order_positions[order_id]
+        orders.retire(row)
+        if orders.needs_compaction():
+            self._set_order_store(orders.compacted())
+        self._version += 1
+        return True
+
+    def get_inventory_by_product_id(self, product_id: str) -> list[ProductInventory]:
+        inventory = self.inventory
+        return [inventory[row] for row in inventory.rows_by_product_id.get(product_id, ())]
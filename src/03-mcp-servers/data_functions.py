@@ -1,5 +1,23 @@
+import base64
+import bisect
+import heapq
 import json
-from pydantic import BaseModel, Field
+import os
+import re
+import threading
+import traceback
+import unicodedata
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from functools import lru_cache
+from typing import Any, Iterable, Iterator
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError, create_model
+
+# File locks for order logs shared by several processes, only available on POSIX systems
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 class Discount(BaseModel):
     discount_id: str
@@ -54,35 +72,817 @@ class Order(BaseModel):
     fill_strategy: str = None
     order_items: list[Product] = None
 
+class ProductStock(BaseModel):
+    product_id: str
+    total_volume: int
+    volume_by_location: dict[str, int]
+
+class CustomerMatch(BaseModel):
+    customer: Customer
+    score: float
+
+class CatalogPage(BaseModel):
+    items: list[dict[str, Any]]
+    next_cursor: str | None = None
+
+# Most IDs a batch request may ask for at once, larger batches are rejected
+MAX_BATCH_SIZE = 500
+
+class IdBatch(BaseModel):
+    ids: list[str] = Field(max_length=MAX_BATCH_SIZE)
+
 class Message(BaseModel):
     message: str
 
+@lru_cache(maxsize=None)
+def _json_file_model(key: str, model: type[BaseModel]) -> type[BaseModel]:
+    return create_model(f"{model.__name__}File", **{key: (list[model], ...)})
+
+def load_models_from_json(file_name: str, key: str, model: type[BaseModel]) -> list[BaseModel]:
+    """
+    Parses and validates the list stored under key in a JSON file in a single pass.
+    The raw bytes go straight into pydantic's JSON parser, so no intermediate dicts are built.
+    :param file_name (str): The name of the file to load the data from.
+    :param key (str): The top level key holding the list.
+    :param model (type[BaseModel]): The model of the list items.
+    :return: List of validated models.
+    :rtype: list[BaseModel]
+    """
+    with open(file_name, 'rb') as f:
+        raw = f.read()
+    return getattr(_json_file_model(key, model).model_validate_json(raw), key)
+
+class _JsonStreamReader:
+    """Reads JSON values one at a time from a text file, keeping only a small window of it in memory."""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise json.JSONDecodeError("Unexpected end of file", self.buffer, self.pos)
+
+    def expect(self, token: str):
+        if self.peek() != token:
+            raise json.JSONDecodeError(f"Expecting '{token}'", self.buffer, self.pos)
+        self.pos += 1
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number cut off by the end of the window may continue in the next chunk
+                complete = (
+                    isinstance(value, bool) or not isinstance(value, (int, float))
+                    or (end < len(self.buffer) and self.buffer[end] in " \t\r\n,]}")
+                )
+                if complete or not self._fill():
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+
+def iter_json_array(file_name: str, key: str, chunk_size: int = 1 << 16) -> Iterator:
+    """
+    Yields the items of the array stored under a top level key of a JSON file one by one.
+    Only the current item and one read chunk are held in memory, so arbitrarily large files can be streamed.
+    :param file_name (str): The name of the file to read.
+    :param key (str): The top level key holding the array.
+    :param chunk_size (int): The number of characters to read at a time.
+    :return: Iterator over the decoded array items.
+    :rtype: Iterator
+    """
+    with open(file_name, 'r') as f:
+        reader = _JsonStreamReader(f, chunk_size)
+        reader.expect("{")
+        while True:
+            if reader.peek() == "}":
+                raise json.JSONDecodeError(f"Missing key '{key}'", reader.buffer, reader.pos)
+            name = reader.decode()
+            reader.expect(":")
+            if name == key:
+                break
+            reader.decode()
+            if reader.peek() == ",":
+                reader.expect(",")
+        reader.expect("[")
+        if reader.peek() == "]":
+            return
+        while True:
+            yield reader.decode()
+            if reader.peek() == "]":
+                return
+            reader.expect(",")
+
+def _check_page(offset: int, limit: int):
+    if offset < 0:
+        raise ValueError("offset must not be negative")
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+
+def replace_in_group(groups: dict[str, dict], old_group: str, old_key: str, new_group: str, new_key: str, value):
+    """
+    Moves or replaces an entry of a two level index without changing any inner dict in place.
+    The affected inner dicts are copied, changed and swapped in, so readers iterating an inner dict are never disturbed.
+    """
+    old_entries = groups.get(old_group, {})
+    remaining = {key: entry for key, entry in old_entries.items() if key != old_key}
+    if old_group == new_group:
+        entries = dict(old_entries) if old_key == new_key else remaining
+        entries[new_key] = value
+        groups[new_group] = entries
+        return
+    new_entries = dict(groups.get(new_group, {}))
+    new_entries[new_key] = value
+    groups[new_group] = new_entries
+    if remaining:
+        groups[old_group] = remaining
+    else:
+        groups.pop(old_group, None)
+
+def _order_from_log(data: dict) -> Order:
+    # Logs written before unset fields were left out hold null for them
+    return Order.model_validate({field: value for field, value in data.items() if value is not None})
+
+class OrderLog:
+    """
+    Append-only write-ahead log of order updates.
+    Every update is one JSON line, so a write costs a single append. After snapshot_every updates
+    the current orders are written to a compact snapshot file and the log starts over,
+    which keeps the replay on startup bounded.
+    A shared log is written by several processes, e.g. the workers of one server. Appends take an
+    exclusive file lock, and every process follows the entries the others appended. A snapshot
+    replaces the log with a new file instead of truncating it, so a process that still follows
+    the old file reads it to the end before it switches over.
+    """
+
+    def __init__(self, log_file: str, snapshot_file: str, snapshot_every: int = 1000, fsync: bool = True, shared: bool = False):
+        if shared and fcntl is None:
+            raise ValueError("A shared order log needs file locks, which are not available on this platform")
+        self.log_file = log_file
+        self.snapshot_file = snapshot_file
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.shared = shared
+        self.entries = 0
+        self.offset = 0
+        self.file = None
+        self.lock_file = None
+        self.lock_depth = 0
+
+    def replay(self) -> Iterator[tuple[str, Order]]:
+        """
+        Yields the logged updates in order and drops a torn last line left behind by a crash.
+        :return: Iterator over (order_id, order) tuples.
+        :rtype: Iterator[tuple[str, Order]]
+        """
+        if not os.path.exists(self.log_file):
+            return
+        valid_size = 0
+        with open(self.log_file, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                    update = entry["order_id"], _order_from_log(entry["order"])
+                except (ValueError, KeyError, TypeError) as e:
+                    raise ValueError(f"Corrupt order log entry at byte {valid_size}: {e}")
+                valid_size += len(line)
+                self.entries += 1
+                yield update
+        if valid_size < os.path.getsize(self.log_file):
+            os.truncate(self.log_file, valid_size)
+        self.offset = valid_size
+
+    @contextmanager
+    def locked(self):
+        """
+        Holds the exclusive lock of a shared log, so no other process appends in the meantime.
+        Does nothing for a log that is not shared. Callers hold the write lock of their DataLayer,
+        which makes nesting safe: only the outermost call takes and releases the file lock.
+        """
+        if not self.shared or self.lock_depth:
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+            return
+        if self.lock_file is None:
+            self.lock_file = open(self.log_file + ".lock", 'a')
+        fcntl.flock(self.lock_file, fcntl.LOCK_EX)
+        self.lock_depth = 1
+        try:
+            yield
+        finally:
+            self.lock_depth = 0
+            fcntl.flock(self.lock_file, fcntl.LOCK_UN)
+
+    def open(self):
+        self.file = open(self.log_file, 'a+b')
+
+    def follow(self) -> Iterator[tuple[str, Order]]:
+        """
+        Yields the updates that other processes appended to a shared log since the last call,
+        including those in the rest of a log file that a snapshot has replaced meanwhile.
+        An entry that cannot be read is reported once and skipped.
+        :return: Iterator over (order_id, order) tuples.
+        :rtype: Iterator[tuple[str, Order]]
+        """
+        while True:
+            # Checked before reading: once the file is replaced, nobody appends to the old one any more
+            try:
+                replaced = os.stat(self.log_file).st_ino != os.fstat(self.file.fileno()).st_ino
+            except FileNotFoundError:
+                replaced = False
+            yield from self._read_new_entries()
+            if not replaced:
+                return
+            self.file.close()
+            self.open()
+            self.offset = 0
+            self.entries = 0
+
+    def _read_new_entries(self) -> Iterator[tuple[str, Order]]:
+        size = os.fstat(self.file.fileno()).st_size
+        if size <= self.offset:
+            return
+        data = os.pread(self.file.fileno(), size - self.offset, self.offset)
+        # A line without its newline is still being written
+        end = data.rfind(b"\n") + 1
+        entries = []
+        position = self.offset
+        for line in data[:end].splitlines(keepends=True):
+            try:
+                entry = json.loads(line)
+                entries.append((entry["order_id"], _order_from_log(entry["order"])))
+            except (ValueError, KeyError, TypeError) as e:
+                # Reported once and skipped, so one bad entry does not hold up the entries after it
+                print(f"Skipping corrupt order log entry at byte {position} of {self.log_file}: {e}")
+            position += len(line)
+        self.offset += end
+        self.entries += len(entries)
+        yield from entries
+
+    def append(self, order_id: str, order: Order):
+        # Unset fields are left out, the models reject null for fields that only default to None
+        line = (json.dumps({"order_id": order_id, "order": order.model_dump(mode="json", exclude_none=True)}) + "\n").encode()
+        self.file.write(line)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.entries += 1
+        self.offset += len(line)
+
+    def needs_snapshot(self) -> bool:
+        return self.entries >= self.snapshot_every
+
+    def write_snapshot(self, orders: Iterable[Order]):
+        """
+        Writes the orders to the snapshot file and starts a new, empty log.
+        The snapshot is written to a temporary file first and then renamed, so a crash leaves either the old or the new snapshot.
+        :param orders (Iterable[Order]): The current orders.
+        """
+        tmp_file = self.snapshot_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            f.write('{"orders": [')
+            for i, order in enumerate(orders):
+                if i:
+                    f.write(",\n")
+                f.write(order.model_dump_json(exclude_none=True))
+            f.write("]}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.snapshot_file)
+        tmp_file = self.log_file + ".tmp"
+        open(tmp_file, 'wb').close()
+        os.replace(tmp_file, self.log_file)
+        self.file.close()
+        self.open()
+        self.offset = 0
+        self.entries = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.lock_file is not None:
+            self.lock_file.close()
+            self.lock_file = None
+
+class OrderLogFollower:
+    """
+    Applies the order updates that other processes append to a shared order log in the background,
+    so reads catch up with writes made by the other workers within one interval.
+    """
+
+    def __init__(self, data_layer: "DataLayer", interval: float = 0.1):
+        self.data_layer = data_layer
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="order-log-follower", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.data_layer.follow_order_log()
+            except ValueError as e:
+                print(f"Following the order log failed: {e}")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+def _encode_cursor(offset: int, after: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([offset, after]).encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[int, str]:
+    try:
+        offset, after = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(offset), str(after)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+def _field_projection(model: type[BaseModel] | None, fields: list[str] | None) -> set[str] | None:
+    if not fields:
+        return None
+    unknown = [field for field in fields if field not in model.model_fields] if model is not None else []
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return set(fields)
+
+def catalog_page(items: list[BaseModel], id_field: str, cursor: str = None, limit: int = 50, fields: list[str] = None) -> CatalogPage:
+    """
+    Returns one page of a catalog list, optionally reduced to some fields.
+    The cursor remembers the position and ID of the last item of the previous page. If the catalog changed
+    in the meantime, the page continues after that ID.
+    :param items (list[BaseModel]): The catalog.
+    :param id_field (str): The field that identifies an item.
+    :param cursor (str): The next_cursor of the previous page, None for the first page.
+    :param limit (int): The maximum number of items on the page.
+    :param fields (list[str]): The fields to return for each item, None for all fields.
+    :return: The page and the cursor of the next page, which is None on the last page.
+    :rtype: CatalogPage
+    """
+    if limit < 1:
+        raise ValueError("limit must be at least 1")
+    include = _field_projection(type(items[0]) if items else None, fields)
+    start = 0
+    if cursor:
+        offset, after = _decode_cursor(cursor)
+        if not (0 < offset <= len(items) and getattr(items[offset - 1], id_field) == after):
+            offset = next((i + 1 for i, item in enumerate(items) if getattr(item, id_field) == after), None)
+            if offset is None:
+                raise ValueError(f"Cursor is no longer valid: {cursor}")
+        start = offset
+    page = items[start:start + limit]
+    end = start + len(page)
+    return CatalogPage(
+        items=[item.model_dump(include=include) for item in page],
+        next_cursor=_encode_cursor(end, getattr(page[-1], id_field)) if page and end < len(items) else None,
+    )
+
+class NameIndex:
+    """
+    Search index for fuzzy and prefix matching of names.
+    Names are normalized to lowercase ASCII tokens. Every query token is matched against the token vocabulary
+    exactly, as a prefix through a sorted token list, and by trigram similarity when it is not in the vocabulary.
+    Keys are also indexed by every pair of their tokens, so the names matching a combination of tokens are
+    found with one lookup and the best combinations are tried first until enough names are found.
+    """
+
+    PREFIX_EXPANSIONS = 100
+    MAX_COMBINATIONS = 500
+    MIN_SIMILARITY = 0.3
+
+    def __init__(self):
+        self.tokens_by_key: dict[str, tuple[str, ...]] = {}
+        # Postings are dicts used as ordered sets, so results are deterministic and can be intersected quickly
+        self.postings: dict[str, dict[str, None]] = {}
+        self.pair_postings: dict[tuple[str, str], dict[str, None]] = {}
+        self.trigrams: dict[str, list[str]] = {}
+        self.sorted_tokens: list[str] = None
+
+    @staticmethod
+    def tokenize(name: str) -> list[str]:
+        ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode()
+        return re.findall(r"[a-z0-9]+", ascii_name.lower())
+
+    @staticmethod
+    def token_trigrams(token: str) -> set[str]:
+        padded = f"  {token} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, key: str, name: str):
+        tokens = tuple(dict.fromkeys(self.tokenize(name)))
+        if key in self.tokens_by_key or not tokens:
+            return
+        self.tokens_by_key[key] = tokens
+        for token in tokens:
+            keys = self.postings.get(token)
+            if keys is None:
+                keys = self.postings[token] = {}
+                for trigram in self.token_trigrams(token):
+                    self.trigrams.setdefault(trigram, []).append(token)
+                self.sorted_tokens = None
+            keys[key] = None
+        for i, first in enumerate(tokens):
+            for second in tokens[i + 1:]:
+                self.pair_postings.setdefault(tuple(sorted((first, second))), {})[key] = None
+
+    def _token_matches(self, query_token: str) -> list[tuple[str, float]]:
+        matches = {}
+        sorted_tokens = self.sorted_tokens
+        if sorted_tokens is None:
+            sorted_tokens = self.sorted_tokens = sorted(self.postings)
+        start = bisect.bisect_left(sorted_tokens, query_token)
+        for token in islice(sorted_tokens, start, start + self.PREFIX_EXPANSIONS):
+            if not token.startswith(query_token):
+                break
+            matches[token] = 1.0 if token == query_token else 0.5 + 0.4 * len(query_token) / len(token)
+        if query_token not in matches:
+            # Similar tokens are only searched for tokens that are not in the index, i.e. likely typos
+            query_trigrams = self.token_trigrams(query_token)
+            shared = {}
+            for trigram in query_trigrams:
+                for token in self.trigrams.get(trigram, ()):
+                    shared[token] = shared.get(token, 0) + 1
+            for token, count in shared.items():
+                similarity = count / (len(query_trigrams) + len(token) + 1 - count)
+                if similarity >= self.MIN_SIMILARITY and token not in matches:
+                    matches[token] = 0.8 * similarity
+        return sorted(matches.items(), key=lambda match: match[1], reverse=True)
+
+    def _keys_with(self, tokens: list[str]) -> Iterable[str]:
+        distinct = sorted(set(tokens))
+        if len(distinct) == 1:
+            return self.postings[distinct[0]]
+        keys = self.pair_postings.get((distinct[0], distinct[1]), {})
+        rest = distinct[2:]
+        if not rest:
+            return keys
+        return [key for key in keys if all(token in self.tokens_by_key[key] for token in rest)]
+
+    def _combinations(self, matches: list[list[tuple[str, float]]]) -> Iterator[tuple[float, list[str]]]:
+        # Yields one matching token per query token, best total score first
+        start = (0,) * len(matches)
+        heap = [(-sum(token_matches[0][1] for token_matches in matches), start)]
+        seen = {start}
+        while heap:
+            total, indexes = heapq.heappop(heap)
+            yield -total, [matches[i][index][0] for i, index in enumerate(indexes)]
+            for i, index in enumerate(indexes):
+                if index + 1 < len(matches[i]):
+                    following = indexes[:i] + (index + 1,) + indexes[i + 1:]
+                    if following not in seen:
+                        seen.add(following)
+                        score = total + matches[i][index][1] - matches[i][index + 1][1]
+                        heapq.heappush(heap, (score, following))
+
+    def search(self, query: str, limit: int = 10) -> list[tuple[str, float]]:
+        """
+        Finds the keys whose names match the query best.
+        A key scores the average over the query tokens of its best matching token: 1 for an exact token,
+        0.5 to 0.9 for a prefix depending on how much of the token it covers, and below 0.8 for a similar token.
+        :param query (str): The name or part of a name to search for.
+        :param limit (int): The maximum number of matches.
+        :return: (key, score) tuples with the best match first, scores are between 0 and 1.
+        :rtype: list[tuple[str, float]]
+        """
+        query_tokens = list(dict.fromkeys(self.tokenize(query)))
+        if not query_tokens or limit <= 0:
+            return []
+        matches = [self._token_matches(query_token) for query_token in query_tokens]
+        found = {}
+        if all(matches):
+            # Names that match every query token, from the best combination of tokens down
+            for combination, (total, tokens) in enumerate(self._combinations(matches)):
+                if len(found) >= limit or combination >= self.MAX_COMBINATIONS:
+                    break
+                for key in self._keys_with(tokens):
+                    if key not in found:
+                        found[key] = total / len(matches)
+                        if len(found) >= limit:
+                            break
+        if len(matches) > 1:
+            # Names that miss a query token rank below full matches unless the other tokens match better
+            token_scores = [dict(token_matches) for token_matches in matches]
+            for token_matches in matches:
+                for key in self._top_keys(token_matches, limit):
+                    if key not in found:
+                        tokens = self.tokens_by_key[key]
+                        found[key] = sum(max([scores.get(token, 0.0) for token in tokens]) for scores in token_scores) / len(matches)
+        # Ties go to the names with the fewest tokens the query does not cover
+        tokens_by_key = self.tokens_by_key
+        return heapq.nsmallest(limit, found.items(), key=lambda match: (-match[1], len(tokens_by_key[match[0]])))
+
+    def _top_keys(self, token_matches: list[tuple[str, float]], limit: int) -> dict[str, float]:
+        # Tokens come best first, so only the postings up to the limit are read
+        keys = {}
+        for token, score in token_matches:
+            for key in islice(self.postings[token], limit):
+                keys.setdefault(key, score)
+            if len(keys) >= limit:
+                break
+        return keys
+
+class DataWatcher:
+    """
+    Polls the reloadable data files of a DataLayer and reloads a file in the background once it changed.
+    A file counts as changed when its modification time or size differs from the last load and has not
+    changed since the previous check, so a file that is still being written is not picked up half way.
+    Replace files with an atomic rename where possible.
+    """
+
+    FILES = {
+        "suppliers.json": "reload_supplier_from_json",
+        "customers.json": "reload_customer_from_json",
+        "inventory.json": "reload_inventory_from_json",
+    }
+
+    def __init__(self, data_layer: "DataLayer", data_path: str, interval: float = 2.0):
+        self.data_layer = data_layer
+        self.data_path = data_path
+        self.interval = interval
+        self.loaded = {name: self._stat(name) for name in self.FILES}
+        self.pending = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _stat(self, name: str) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(os.path.join(self.data_path, name))
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def check(self) -> list[str]:
+        """
+        Checks the files once and reloads the ones that changed and are stable.
+        :return: The names of the reloaded files.
+        :rtype: list[str]
+        """
+        reloaded = []
+        for name, reload in self.FILES.items():
+            stat = self._stat(name)
+            if stat is None or stat == self.loaded[name]:
+                self.pending.pop(name, None)
+                continue
+            if self.pending.get(name) != stat:
+                self.pending[name] = stat
+                continue
+            del self.pending[name]
+            try:
+                getattr(self.data_layer, reload)(os.path.join(self.data_path, name), stream=type(self.data_layer) is not DataLayer)
+                reloaded.append(name)
+            except ValueError as e:
+                print(f"Reloading {name} failed, keeping the current data: {e}")
+            except Exception:
+                # Anything else, e.g. a locked sqlite database, must not end the watcher thread
+                print(f"Reloading {name} failed, keeping the current data:")
+                traceback.print_exc()
+            # Also remembered after a failure, so a broken file is not retried until it changes again
+            self.loaded[name] = stat
+        return reloaded
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
 class DataLayer(BaseModel):
     suppliers: list[Supplier] = Field(None)
     customers: list[Customer] = Field(None)
     orders: list[Order] = Field(None)
     inventory: list[ProductInventory] = Field(None)
 
+    _version: int = PrivateAttr(default=0)
+    _suppliers_by_id: dict[str, Supplier] = PrivateAttr(default_factory=dict)
+    _products_by_id: dict[str, Product] = PrivateAttr(default_factory=dict)
+    _discounts_by_id: dict[str, Discount] = PrivateAttr(default_factory=dict)
+    _product_catalog: list[Product] = PrivateAttr(default_factory=list)
+    _discount_catalog: list[Discount] = PrivateAttr(default_factory=list)
+    _customers_by_id: dict[str, Customer] = PrivateAttr(default_factory=dict)
+    _customers_by_name: dict[str, Customer] = PrivateAttr(default_factory=dict)
+    _customer_names: NameIndex = PrivateAttr(default_factory=NameIndex)
+    _orders_by_id: dict[str, Order] = PrivateAttr(default_factory=dict)
+    _order_positions: dict[str, int] = PrivateAttr(default_factory=dict)
+    _orders_by_customer_id: dict[str, dict[str, Order]] = PrivateAttr(default_factory=dict)
+    _inventory_by_product_id: dict[str, list[ProductInventory]] = PrivateAttr(default_factory=dict)
+    _stock_by_product_id: dict[str, dict[str, int]] = PrivateAttr(default_factory=dict)
+    _order_log: OrderLog = PrivateAttr(default=None)
+    _order_log_follower: OrderLogFollower = PrivateAttr(default=None)
+    _write_lock: threading.RLock = PrivateAttr(default_factory=threading.RLock)
+    _change_listeners: list = PrivateAttr(default_factory=list)
+
     def fill_data(self):
         self.suppliers = self.generate_supplier_data()
         self.customers = self.generate_customer_data()
         self.orders = self.generate_order_data()
         self.inventory = self.generate_inventory_data()
+        self.rebuild_indexes()
+
+    @property
+    def data_version(self) -> int:
+        """
+        A counter that is bumped whenever the data changes.
+        Callers can use it to invalidate anything derived from the data.
+        """
+        return self._version
+
+    def add_change_listener(self, listener):
+        """
+        Registers a callable that is called after the data changed, with the kind of data that changed
+        ("suppliers", "customers", "orders" or "inventory") and the IDs of the changed items, or None if all of them may have changed.
+        Order updates pass the order ID before and after the update.
+        The listener runs in the thread that made the change, so it has to return quickly and must not change the data itself.
+        It must not rely on the write lock either: order updates call it while they hold the lock, reloads after they released it.
+        :param listener (Callable[[str, set[str] | None], None]): The listener.
+        """
+        self._change_listeners.append(listener)
+
+    def remove_change_listener(self, listener):
+        """
+        Removes a listener registered with add_change_listener.
+        :param listener (Callable[[str, set[str] | None], None]): The listener.
+        """
+        self._change_listeners.remove(listener)
 
-    def load_supplier_from_json(self, file_name: str):
+    def _notify_change(self, kind: str, ids: set[str] | None):
+        for listener in self._change_listeners:
+            try:
+                listener(kind, ids)
+            except Exception as e:
+                print(f"Change listener failed: {e}")
+
+    def rebuild_indexes(self):
+        """
+        Rebuilds all lookup indexes from the current lists.
+        Call this after assigning the data lists directly instead of using the loaders.
+        """
+        self._index_suppliers()
+        self._index_customers()
+        self._index_orders()
+        self._index_inventory()
+
+    def _index_suppliers(self):
+        self._reset_supplier_index()
+        for supplier in self.suppliers or []:
+            self._add_supplier_to_index(supplier)
+        self._build_catalogs()
+
+    def _reset_supplier_index(self):
+        self._version += 1
+        self._suppliers_by_id = {}
+        self._products_by_id = {}
+        self._discounts_by_id = {}
+
+    def _add_supplier_to_index(self, supplier: Supplier):
+        self._suppliers_by_id.setdefault(supplier.supplier_id, supplier)
+        for product in supplier.products or []:
+            self._products_by_id.setdefault(product.product_id, product)
+        for discount in supplier.discounts or []:
+            self._discounts_by_id.setdefault(discount.discount_id, discount)
+
+    def _append_supplier(self, supplier: Supplier):
+        self._add_supplier_to_index(supplier)
+        self.suppliers.append(supplier)
+
+    def _build_catalogs(self):
+        self._product_catalog = list(self._products_by_id.values())
+        self._discount_catalog = list(self._discounts_by_id.values())
+
+    def _index_customers(self):
+        self._reset_customer_index()
+        for customer in self.customers or []:
+            self._add_customer_to_index(customer)
+
+    def _reset_customer_index(self):
+        self._version += 1
+        self._customers_by_id = {}
+        self._customers_by_name = {}
+        self._customer_names = NameIndex()
+
+    def _add_customer_to_index(self, customer: Customer):
+        self._customers_by_id.setdefault(customer.customer_id, customer)
+        self._customers_by_name.setdefault(customer.customer_name, customer)
+        self._customer_names.add(customer.customer_id, customer.customer_name)
+
+    def _append_customer(self, customer: Customer):
+        self._add_customer_to_index(customer)
+        self.customers.append(customer)
+
+    def _index_orders(self):
+        self._reset_order_index()
+        for i, order in enumerate(self.orders or []):
+            self._add_order_to_index(order, i)
+
+    def _reset_order_index(self):
+        self._version += 1
+        self._orders_by_id = {}
+        self._order_positions = {}
+        self._orders_by_customer_id = {}
+
+    def _add_order_to_index(self, order: Order, position: int):
+        if order.order_id not in self._orders_by_id:
+            self._orders_by_id[order.order_id] = order
+            self._order_positions[order.order_id] = position
+            self._orders_by_customer_id.setdefault(order.customer_id, {})[order.order_id] = order
+
+    def _append_order(self, order: Order):
+        self._add_order_to_index(order, len(self.orders))
+        self.orders.append(order)
+
+    def _index_inventory(self):
+        self._reset_inventory_index()
+        for item in self.inventory or []:
+            self._add_inventory_to_index(item)
+
+    def _reset_inventory_index(self):
+        self._version += 1
+        self._inventory_by_product_id = {}
+        self._stock_by_product_id = {}
+
+    def _add_inventory_to_index(self, item: ProductInventory):
+        self._inventory_by_product_id.setdefault(item.product_id, []).append(item)
+        self._add_inventory_to_stock(item)
+
+    def _add_inventory_to_stock(self, item: ProductInventory):
+        stock = self._stock_by_product_id.setdefault(item.product_id, {})
+        stock[item.location] = stock.get(item.location, 0) + item.volume
+
+    def _append_inventory(self, item: ProductInventory):
+        self._add_inventory_to_index(item)
+        self.inventory.append(item)
+
+    def load_supplier_from_json(self, file_name: str, fast: bool = False, stream: bool = False):
         """
         Loads supplier data from a JSON file.
         :param file_name (str): The name of the file to load the data from.
+        :param fast (bool): Parse and validate the whole file in one pass instead of row by row.
+        :param stream (bool): Parse the file item by item and index each item as it is read, keeping peak memory close to the final data size.
         """
         try:
-            with open(file_name, 'r') as f:
-                data = json.load(f)
-                self.suppliers = [Supplier(**supplier) for supplier in data["suppliers"]]
+            if stream:
+                self.suppliers = []
+                self._reset_supplier_index()
+                for row in iter_json_array(file_name, "suppliers"):
+                    supplier = Supplier.model_validate(row)
+                    self._append_supplier(supplier)
+                self._build_catalogs()
+            else:
+                if fast:
+                    self.suppliers = load_models_from_json(file_name, "suppliers", Supplier)
+                else:
+                    with open(file_name, 'r') as f:
+                        data = json.load(f)
+                        self.suppliers = [Supplier(**supplier) for supplier in data["suppliers"]]
+                self._index_suppliers()
             print("Loaded suppliers:", len(self.suppliers))
         except IOError as e:
             raise ValueError(f"Error loading file: {e}")
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, ValidationError) as e:
             raise ValueError(f"Error decoding JSON: {e}")
+        except (KeyError, TypeError, AttributeError) as e:
+            # A missing top level key or a value of the wrong shape, e.g. an object where a list is expected
+            raise ValueError(f"Unexpected JSON structure: {e!r}")
         
     def save_supplier_to_json(self, file_name: str):
         """
@@ -134,20 +934,36 @@ class DataLayer(BaseModel):
         except IOError as e:
             raise ValueError(f"Error saving to file: {e}")
         
-    def load_customer_from_json(self, file_name: str):  
+    def load_customer_from_json(self, file_name: str, fast: bool = False, stream: bool = False):
         """
         Loads customer data from a JSON file.
         :param file_name (str): The name of the file to load the data from.
+        :param fast (bool): Parse and validate the whole file in one pass instead of row by row.
+        :param stream (bool): Parse the file item by item and index each item as it is read, keeping peak memory close to the final data size.
         """
         try:
-            with open(file_name, 'r') as f:
-                data = json.load(f)
-                self.customers = [Customer(**customer) for customer in data["customers"]]
+            if stream:
+                self.customers = []
+                self._reset_customer_index()
+                for row in iter_json_array(file_name, "customers"):
+                    customer = Customer.model_validate(row)
+                    self._append_customer(customer)
+            else:
+                if fast:
+                    self.customers = load_models_from_json(file_name, "customers", Customer)
+                else:
+                    with open(file_name, 'r') as f:
+                        data = json.load(f)
+                        self.customers = [Customer(**customer) for customer in data["customers"]]
+                self._index_customers()
             print("Loaded customers:", len(self.customers))
         except IOError as e:
             raise ValueError(f"Error loading file: {e}")
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, ValidationError) as e:
             raise ValueError(f"Error decoding JSON: {e}")
+        except (KeyError, TypeError, AttributeError) as e:
+            # A missing top level key or a value of the wrong shape, e.g. an object where a list is expected
+            raise ValueError(f"Unexpected JSON structure: {e!r}")
 
     def generate_order_data(self) -> list[Order]:
         """
@@ -176,20 +992,36 @@ class DataLayer(BaseModel):
             ) for i in range(10)
         ]
 
-    def load_order_from_json(self, file_name: str):
+    def load_order_from_json(self, file_name: str, fast: bool = False, stream: bool = False):
         """
         Loads order data from a JSON file.
         :param file_name (str): The name of the file to load the data from.
+        :param fast (bool): Parse and validate the whole file in one pass instead of row by row.
+        :param stream (bool): Parse the file item by item and index each item as it is read, keeping peak memory close to the final data size.
         """
         try:
-            with open(file_name, 'r') as f:
-                data = json.load(f)
-                self.orders = [Order(**order) for order in data["orders"]]
+            if stream:
+                self.orders = []
+                self._reset_order_index()
+                for row in iter_json_array(file_name, "orders"):
+                    order = Order.model_validate(row)
+                    self._append_order(order)
+            else:
+                if fast:
+                    self.orders = load_models_from_json(file_name, "orders", Order)
+                else:
+                    with open(file_name, 'r') as f:
+                        data = json.load(f)
+                        self.orders = [Order(**order) for order in data["orders"]]
+                self._index_orders()
             print("Loaded orders:", len(self.orders))
         except IOError as e:
             raise ValueError(f"Error loading file: {e}")
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, ValidationError) as e:
             raise ValueError(f"Error decoding JSON: {e}")
+        except (KeyError, TypeError, AttributeError) as e:
+            # A missing top level key or a value of the wrong shape, e.g. an object where a list is expected
+            raise ValueError(f"Unexpected JSON structure: {e!r}")
     
     def save_order_to_json(self, file_name: str):   
         """
@@ -260,10 +1092,7 @@ class DataLayer(BaseModel):
         :return: The supplier object.
         :rtype: Supplier
         """
-        for supplier in self.suppliers:
-            if supplier.supplier_id == supplier_id:
-                return supplier
-        return None
+        return self._suppliers_by_id.get(supplier_id)
     
     def get_customer_by_id(self, customer_id: str) -> Customer:
         """
@@ -273,23 +1102,49 @@ class DataLayer(BaseModel):
         :return: The customer object.
         :rtype: Customer
         """
-        for customer in self.customers:
-            if customer.customer_id == customer_id:
-                return customer
-        return None
+        return self._customers_by_id.get(customer_id)
     
     def get_customer_by_name(self, customer_name: str) -> Customer:
         """
-        Fetches a customer by its ID.
+        Fetches a customer by its name.
 
-        :param customer_id (str): The ID of the customer to fetch.
+        :param customer_name (str): The name of the customer to fetch.
         :return: The customer object.
         :rtype: Customer
         """
-        for customer in self.customers:
-            if customer.customer_name == customer_name:
-                return customer
-        return None
+        return self._customers_by_name.get(customer_name)
+
+    def search_customers(self, query: str, limit: int = 10) -> list[CustomerMatch]:
+        """
+        Searches customers by name, tolerating different case, accents, partial names and typos.
+        "alice johnson", "Alice J." and "alice jonson" all find Alice Johnson.
+
+        :param query (str): The name or part of a name to search for.
+        :param limit (int): The maximum number of matches to return.
+        :return: List of matches with their score between 0 and 1, best match first.
+        :rtype: list[CustomerMatch]
+        """
+        matches = []
+        for customer_id, score in self._customer_name_index().search(query, limit):
+            customer = self.get_customer_by_id(customer_id)
+            if customer is not None:
+                matches.append(CustomerMatch(customer=customer, score=round(score, 4)))
+        return matches
+
+    def _customer_name_index(self) -> NameIndex:
+        return self._customer_names
+
+    def get_customers_by_ids(self, customer_ids: list[str]) -> list[Customer]:
+        """
+        Fetches several customers by their IDs in one call.
+        Unknown IDs are skipped and duplicates are returned once.
+
+        :param customer_ids (list[str]): The IDs of the customers to fetch.
+        :return: List of customer objects in the order of the given IDs.
+        :rtype: list[Customer]
+        """
+        customers = (self.get_customer_by_id(customer_id) for customer_id in dict.fromkeys(customer_ids))
+        return [customer for customer in customers if customer is not None]
     
     def get_order_by_id(self, order_id: str) -> Order:
         """
@@ -299,10 +1154,19 @@ class DataLayer(BaseModel):
         :return: The order object.
         :rtype: Order
         """
-        for order in self.orders:
-            if order.order_id == order_id:
-                return order
-        return None
+        return self._orders_by_id.get(order_id)
+
+    def get_orders_by_ids(self, order_ids: list[str]) -> list[Order]:
+        """
+        Fetches several orders by their IDs in one call.
+        Unknown IDs are skipped and duplicates are returned once.
+
+        :param order_ids (list[str]): The IDs of the orders to fetch.
+        :return: List of order objects in the order of the given IDs.
+        :rtype: list[Order]
+        """
+        orders = (self.get_order_by_id(order_id) for order_id in dict.fromkeys(order_ids))
+        return [order for order in orders if order is not None]
     
     def get_orders_by_customer_id(self, customer_id: str) -> list[Order]:
         """
@@ -312,61 +1176,355 @@ class DataLayer(BaseModel):
         :return: List of order objects.
         :rtype: list[Order]
         """
-        return [order for order in self.orders if order.customer_id == customer_id]
+        return list(self._orders_by_customer_id.get(customer_id, {}).values())
+
+    def iter_orders_by_customer_id(self, customer_id: str) -> Iterator[Order]:
+        """
+        Iterates over the orders of a given customer ID without copying them into a list.
+
+        :param customer_id (str): The ID of the customer to iterate orders for.
+        :return: Iterator over order objects.
+        :rtype: Iterator[Order]
+        """
+        yield from self._orders_by_customer_id.get(customer_id, {}).values()
+
+    def get_orders_by_customer_id_page(self, customer_id: str, offset: int = 0, limit: int = 50) -> list[Order]:
+        """
+        Fetches one page of orders for a given customer ID.
+
+        :param customer_id (str): The ID of the customer to fetch orders for.
+        :param offset (int): The number of orders to skip, must not be negative.
+        :param limit (int): The maximum number of orders to return, at least 1.
+        :return: List of order objects.
+        :rtype: list[Order]
+        """
+        _check_page(offset, limit)
+        orders = self._orders_by_customer_id.get(customer_id, {}).values()
+        return list(islice(orders, offset, offset + limit))
+
+    def get_orders_page(self, customer_id: str, cursor: str = None, limit: int = 50, fields: list[str] = None) -> CatalogPage:
+        """
+        Fetches one page of the orders of a customer, optionally reduced to some fields.
+        Like catalog_page, the cursor remembers the position and ID of the last order of the previous page.
+        Only the orders of the page are materialized, but the backends still step over the orders before it,
+        so a page deep into the orders of a customer costs more than the first ones.
+        :param customer_id (str): The ID of the customer to fetch orders for.
+        :param cursor (str): The next_cursor of the previous page, None for the first page.
+        :param limit (int): The maximum number of orders on the page.
+        :param fields (list[str]): The order fields to return. None returns all fields.
+        :return: The page of orders and the cursor of the next page, which is None on the last page.
+        :rtype: CatalogPage
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        include = _field_projection(Order, fields)
+        start = 0
+        if cursor:
+            offset, after = _decode_cursor(cursor)
+            previous = self.get_orders_by_customer_id_page(customer_id, offset - 1, 1) if offset > 0 else []
+            if not previous or previous[0].order_id != after:
+                # Orders of the customer were added or moved since, continue after the last order of the previous page
+                orders = self.iter_orders_by_customer_id(customer_id)
+                offset = next((i + 1 for i, order in enumerate(orders) if order.order_id == after), None)
+                if offset is None:
+                    raise ValueError(f"Cursor is no longer valid: {cursor}")
+            start = offset
+        # One order more than the page tells whether another page follows
+        orders = self.get_orders_by_customer_id_page(customer_id, start, limit + 1)
+        page = orders[:limit]
+        return CatalogPage(
+            items=[order.model_dump(include=include) for order in page],
+            next_cursor=_encode_cursor(start + len(page), page[-1].order_id) if len(orders) > limit else None,
+        )
 
     def get_all_products(self) -> list[Product]:
         """
-        Fetches all products from all suppliers.
+        Fetches all products from all suppliers, deduplicated by product ID.
+        The returned list is shared between callers and must not be modified.
 
         :return: List of product objects.
         :rtype: list[Product]
         """
-        products = []
-        for supplier in self.suppliers:
-            products.extend(supplier.products)
-        return products
+        return self._product_catalog
+
+    def get_product_by_id(self, product_id: str) -> Product:
+        """
+        Fetches a product from the supplier catalog by its ID.
+
+        :param product_id (str): The ID of the product to fetch.
+        :return: The product object.
+        :rtype: Product
+        """
+        return self._products_by_id.get(product_id)
 
     def get_all_discounts(self) -> list[Discount]:
         """
-        Fetches all discounts from all suppliers.
+        Fetches all discounts from all suppliers, deduplicated by discount ID.
+        The returned list is shared between callers and must not be modified.
 
         :return: List of discount objects.
         :rtype: list[Discount]
         """
-        discounts = []
-        for supplier in self.suppliers:
-            discounts.extend(supplier.discounts)
-        return discounts
+        return self._discount_catalog
+
+    def get_products_page(self, cursor: str = None, limit: int = 50, fields: list[str] = None) -> CatalogPage:
+        """
+        Fetches one page of the product catalog, optionally with only some fields of each product.
+
+        :param cursor (str): The next_cursor of the previous page, None for the first page.
+        :param limit (int): The maximum number of products on the page.
+        :param fields (list[str]): The product fields to return, e.g. ["product_id", "list_price"]. None returns all fields.
+        :return: The page of products and the cursor of the next page, which is None on the last page.
+        :rtype: CatalogPage
+        """
+        return catalog_page(self.get_all_products(), "product_id", cursor, limit, fields)
+
+    def get_discounts_page(self, cursor: str = None, limit: int = 50, fields: list[str] = None) -> CatalogPage:
+        """
+        Fetches one page of the discount catalog, optionally with only some fields of each discount.
+
+        :param cursor (str): The next_cursor of the previous page, None for the first page.
+        :param limit (int): The maximum number of discounts on the page.
+        :param fields (list[str]): The discount fields to return. None returns all fields.
+        :return: The page of discounts and the cursor of the next page, which is None on the last page.
+        :rtype: CatalogPage
+        """
+        return catalog_page(self.get_all_discounts(), "discount_id", cursor, limit, fields)
     
     def update_order(self, order_id: str, order_data: Order) -> bool:
         """
         Updates an existing order with new data.
+        Updates are serialized, while readers never wait: the indexes are changed by swapping in
+        updated copies, so a concurrent reader sees either the old or the new order, never a mix.
 
         :param order_id (str): The ID of the order to update.
         :param order_data (Order): The new order data.
-        :return: True if the order was updated successfully, False otherwise.
+        :return: True if the order was updated successfully, False if it does not exist
+            or order_data renames it to the ID of another order.
         :rtype: bool
         """
-        for i, order in enumerate(self.orders):
-            if order.order_id == order_id:
-                self.orders[i] = order_data
-                return True
-        return False
+        with self._write_lock, self._order_log_locked():
+            # With a shared order log the updates of the other processes are applied first,
+            # so every process applies all updates in the order of the log
+            self.follow_order_log()
+            if not self._order_exists(order_id):
+                return False
+            # Checked before the update is logged, a rejected update must not be replayed later
+            if self._renames_onto_other_order(order_id, order_data):
+                return False
+            if self._order_log is not None:
+                self._order_log.append(order_id, order_data)
+            self._apply_order_update(order_id, order_data)
+            if self._order_log is not None and self._order_log.needs_snapshot():
+                self.snapshot_orders()
+            self._notify_change("orders", {order_id, order_data.order_id})
+            return True
+
+    def _order_log_locked(self):
+        return self._order_log.locked() if self._order_log is not None else nullcontext()
+
+    def _order_exists(self, order_id: str) -> bool:
+        return order_id in self._order_positions
+
+    def _renames_onto_other_order(self, order_id: str, order_data: Order) -> bool:
+        return order_data.order_id != order_id and self._order_exists(order_data.order_id)
 
-    def load_inventory_from_json(self, file_name: str):
+    def _apply_order_update(self, order_id: str, order_data: Order) -> bool:
+        position = self._order_positions.get(order_id)
+        if position is None or self._renames_onto_other_order(order_id, order_data):
+            return False
+        previous = self.orders[position]
+        replace_in_group(self._orders_by_customer_id, previous.customer_id, order_id, order_data.customer_id, order_data.order_id, order_data)
+        self._orders_by_id[order_data.order_id] = order_data
+        self._order_positions[order_data.order_id] = position
+        if order_id != order_data.order_id:
+            del self._orders_by_id[order_id]
+            del self._order_positions[order_id]
+        self.orders[position] = order_data
+        self._version += 1
+        return True
+
+    def open_order_log(self, log_file: str, snapshot_file: str = None, snapshot_every: int = 1000, fsync: bool = True,
+                       shared: bool = False, follow_interval: float = 0.1):
+        """
+        Makes order updates durable with a write-ahead log.
+        If a snapshot exists it replaces the loaded orders, then the updates logged since the snapshot are replayed.
+        From then on every update_order call is appended to the log before it is applied.
+        A shared log lets several processes update the same orders: each process appends under a file lock
+        and applies the updates of the others in the background.
+        :param log_file (str): The name of the log file.
+        :param snapshot_file (str): The name of the snapshot file, defaults to the log file name with a .snapshot.json suffix.
+        :param snapshot_every (int): The number of logged updates after which a new snapshot is written.
+        :param fsync (bool): Flush every log entry to disk before the update is applied.
+        :param shared (bool): Share the log with other processes.
+        :param follow_interval (float): Seconds between two checks of a shared log for updates of other processes.
+        """
+        if snapshot_file is None:
+            snapshot_file = log_file + ".snapshot.json"
+        order_log = OrderLog(log_file, snapshot_file, snapshot_every, fsync, shared)
+        self.close_order_log()
+        with self._write_lock, order_log.locked():
+            if os.path.exists(snapshot_file):
+                self.load_order_from_json(snapshot_file, stream=True)
+            replayed = 0
+            for order_id, order in order_log.replay():
+                if self._apply_order_update(order_id, order):
+                    replayed += 1
+            order_log.open()
+            self._order_log = order_log
+        if shared:
+            self._order_log_follower = OrderLogFollower(self, follow_interval)
+            self._order_log_follower.start()
+        print("Replayed order updates:", replayed)
+
+    def follow_order_log(self) -> int:
+        """
+        Applies the order updates that other processes appended to a shared order log since the last call.
+        :return: The number of applied updates.
+        :rtype: int
+        """
+        with self._write_lock:
+            order_log = self._order_log
+            if order_log is None or not order_log.shared:
+                return 0
+            applied = 0
+            changed = set()
+            for order_id, order in order_log.follow():
+                if self._apply_order_update(order_id, order):
+                    applied += 1
+                    changed.update((order_id, order.order_id))
+            if changed:
+                self._notify_change("orders", changed)
+            return applied
+
+    def snapshot_orders(self):
+        """
+        Writes all orders to the snapshot file of the order log and starts a new log.
+        """
+        with self._write_lock, self._order_log_locked():
+            if self._order_log is None:
+                raise ValueError("No order log is open")
+            self.follow_order_log()
+            try:
+                self._order_log.write_snapshot(self.orders)
+            except IOError as e:
+                raise ValueError(f"Error saving to file: {e}")
+
+    def close_order_log(self):
+        """
+        Closes the order log. Later updates are kept in memory only.
+        """
+        # Stopped before taking the lock, the follower needs it to finish its last round
+        if self._order_log_follower is not None:
+            self._order_log_follower.stop()
+            self._order_log_follower = None
+        with self._write_lock:
+            if self._order_log is not None:
+                self._order_log.close()
+                self._order_log = None
+
+    def reload_supplier_from_json(self, file_name: str, stream: bool = False):
+        """
+        Reloads supplier data from a JSON file while the data layer keeps serving.
+        See _reload for how the new data is swapped in.
+        :param file_name (str): The name of the file to load the data from.
+        :param stream (bool): Parse the file item by item.
+        """
+        self._reload("load_supplier_from_json", file_name, stream, self._swap_suppliers)
+        self._notify_change("suppliers", None)
+
+    def reload_customer_from_json(self, file_name: str, stream: bool = False):
+        """
+        Reloads customer data from a JSON file while the data layer keeps serving.
+        See _reload for how the new data is swapped in.
+        :param file_name (str): The name of the file to load the data from.
+        :param stream (bool): Parse the file item by item.
+        """
+        self._reload("load_customer_from_json", file_name, stream, self._swap_customers)
+        self._notify_change("customers", None)
+
+    def reload_inventory_from_json(self, file_name: str, stream: bool = False):
+        """
+        Reloads inventory data from a JSON file while the data layer keeps serving.
+        See _reload for how the new data is swapped in.
+        :param file_name (str): The name of the file to load the data from.
+        :param stream (bool): Parse the file item by item.
+        """
+        self._reload("load_inventory_from_json", file_name, stream, self._swap_inventory)
+        self._notify_change("inventory", None)
+
+    def _reload(self, loader: str, file_name: str, stream: bool, swap):
+        # The file is loaded and indexed into a staging data layer without holding any lock,
+        # then the finished indexes are swapped in. Readers keep using the old data until then.
+        # A file that fails to load raises ValueError and leaves the current data untouched.
+        staging = type(self)()
+        getattr(staging, loader)(file_name, stream=stream)
+        with self._write_lock:
+            swap(staging)
+            self._version += 1
+
+    def _swap_suppliers(self, staging: "DataLayer"):
+        self.suppliers = staging.suppliers
+        self._suppliers_by_id = staging._suppliers_by_id
+        self._products_by_id = staging._products_by_id
+        self._discounts_by_id = staging._discounts_by_id
+        self._product_catalog = staging._product_catalog
+        self._discount_catalog = staging._discount_catalog
+
+    def _swap_customers(self, staging: "DataLayer"):
+        self.customers = staging.customers
+        self._customers_by_id = staging._customers_by_id
+        self._customers_by_name = staging._customers_by_name
+        self._customer_names = staging._customer_names
+
+    def _swap_inventory(self, staging: "DataLayer"):
+        self.inventory = staging.inventory
+        self._inventory_by_product_id = staging._inventory_by_product_id
+        self._stock_by_product_id = staging._stock_by_product_id
+
+    def watch_data_files(self, data_path: str, interval: float = 2.0) -> "DataWatcher":
+        """
+        Starts a background thread that reloads suppliers.json, customers.json and inventory.json
+        from data_path whenever one of them changes. Orders are not reloaded, they are changed through update_order.
+        :param data_path (str): The directory holding the JSON files.
+        :param interval (float): Seconds between two checks of the files.
+        :return: The started watcher, call stop() on it to end watching.
+        :rtype: DataWatcher
+        """
+        watcher = DataWatcher(self, data_path, interval)
+        watcher.start()
+        return watcher
+
+    def load_inventory_from_json(self, file_name: str, fast: bool = False, stream: bool = False):
         """
         Loads inventory data from a JSON file.
         :param file_name (str): The name of the file to load the data from.
+        :param fast (bool): Parse and validate the whole file in one pass instead of row by row.
+        :param stream (bool): Parse the file item by item and index each item as it is read, keeping peak memory close to the final data size.
         """
         try:
-            with open(file_name, 'r') as f:
-                data = json.load(f)
-                self.inventory = [ProductInventory(**product) for product in data["inventory"]]
-            print("Loaded inventory:", len(self.inventory))            
+            if stream:
+                self.inventory = []
+                self._reset_inventory_index()
+                for row in iter_json_array(file_name, "inventory"):
+                    product = ProductInventory.model_validate(row)
+                    self._append_inventory(product)
+            else:
+                if fast:
+                    self.inventory = load_models_from_json(file_name, "inventory", ProductInventory)
+                else:
+                    with open(file_name, 'r') as f:
+                        data = json.load(f)
+                        self.inventory = [ProductInventory(**product) for product in data["inventory"]]
+                self._index_inventory()
+            print("Loaded inventory:", len(self.inventory))
         except IOError as e:
             raise ValueError(f"Error loading file: {e}")
-        except json.JSONDecodeError as e:
+        except (json.JSONDecodeError, ValidationError) as e:
             raise ValueError(f"Error decoding JSON: {e}")
+        except (KeyError, TypeError, AttributeError) as e:
+            # A missing top level key or a value of the wrong shape, e.g. an object where a list is expected
+            raise ValueError(f"Unexpected JSON structure: {e!r}")
         
     def get_inventory_by_product_id(self, product_id: str) -> list[ProductInventory]:
         """
@@ -379,9 +1537,186 @@ class DataLayer(BaseModel):
         :return: The inventory object.
         :rtype: ProductInventory
         """
+        return list(self._inventory_by_product_id.get(product_id, []))
+
+    def get_inventory_by_product_ids(self, product_ids: list[str]) -> list[ProductInventory]:
+        """
+        Fetches the inventory items of several products in one call.
+        Duplicate product IDs are returned once.
+
+        :param product_ids (list[str]): The IDs of the products to fetch inventory for.
+        :return: List of inventory items, grouped by product in the order of the given IDs.
+        :rtype: list[ProductInventory]
+        """
         inventory = []
-        for item in self.inventory:
-            if item.product_id == product_id:
-                inventory.append(item)
+        for product_id in dict.fromkeys(product_ids):
+            inventory.extend(self.get_inventory_by_product_id(product_id))
         return inventory
 
+    def _stock_for(self, product_id: str) -> dict[str, int]:
+        return self._stock_by_product_id.get(product_id, {})
+
+    def get_stock_by_product_id(self, product_id: str) -> ProductStock:
+        """
+        Fetches the total stock of a product and its stock per location.
+        The totals are maintained while the inventory is loaded, so this does not walk the inventory.
+
+        :param product_id (str): The ID of the product to fetch the stock for.
+        :return: The stock of the product, or None if the product is not in the inventory.
+        :rtype: ProductStock
+        """
+        stock = self._stock_for(product_id)
+        if not stock:
+            return None
+        return ProductStock(product_id=product_id, total_volume=sum(stock.values()), volume_by_location=dict(stock))
+
+    def get_all_stock(self) -> list[ProductStock]:
+        """
+        Fetches the total stock and the stock per location of every product in the inventory.
+
+        :return: List of product stock objects.
+        :rtype: list[ProductStock]
+        """
+        return [self.get_stock_by_product_id(product_id) for product_id in self._stock_by_product_id]
+
+    def get_locations_for_items(self, items: dict[str, int]) -> list[str]:
+        """
+        Fetches the inventory locations that hold enough stock to fill all given items on their own.
+
+        :param items (dict[str, int]): The required volume per product ID.
+        :return: List of location names, sorted by name.
+        :rtype: list[str]
+        """
+        locations = None
+        for product_id, volume in items.items():
+            stock = self._stock_for(product_id)
+            available = {location for location, location_volume in stock.items() if location_volume >= volume}
+            locations = available if locations is None else locations & available
+            if not locations:
+                return []
+        return sorted(locations or [])
+
+    def get_locations_for_order(self, order_id: str) -> list[str]:
+        """
+        Fetches the inventory locations that can fill an order on their own.
+        Every entry in the order items counts as one unit of that product.
+
+        :param order_id (str): The ID of the order to check.
+        :return: List of location names, or None if the order does not exist.
+        :rtype: list[str]
+        """
+        order = self.get_order_by_id(order_id)
+        if order is None:
+            return None
+        items = {}
+        for product in order.order_items or []:
+            items[product.product_id] = items.get(product.product_id, 0) + 1
+        return self.get_locations_for_items(items)
+
+@contextmanager
+def _file_lock(file_name: str):
+    """
+    Holds an exclusive lock on file_name + ".lock", so only one process at a time builds the file.
+    Does nothing where file locks are not available.
+    :param file_name (str): The name of the file that is built.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(file_name + ".lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def create_data_layer(data_path: str) -> DataLayer:
+    """
+    Creates an empty DataLayer of the backend selected by the DATA_BACKEND environment variable:
+    memory (default), columnar, sqlite, or mapped. The sqlite backend stores its data in SQLITE_FILE,
+    which defaults to ecommerce.db in data_path. The mapped backend opens the binary snapshot SNAPSHOT_FILE,
+    which defaults to ecommerce.snapshot in data_path, and writes it from the JSON files first if it does not exist.
+    :param data_path (str): The directory holding the JSON files.
+    :return: The data layer.
+    :rtype: DataLayer
+    """
+    backend = os.getenv("DATA_BACKEND", "memory")
+    if backend == "memory":
+        return DataLayer()
+    if backend == "columnar":
+        from data_columnar import ColumnarDataLayer
+        return ColumnarDataLayer()
+    if backend == "sqlite":
+        from data_sqlite import SqliteDataLayer
+        return SqliteDataLayer(database_file=os.getenv("SQLITE_FILE", os.path.join(data_path, "ecommerce.db")))
+    if backend == "mapped":
+        from data_columnar import ColumnarDataLayer
+        from data_mapped import MappedDataLayer, write_snapshot
+        snapshot_file = os.getenv("SNAPSHOT_FILE", os.path.join(data_path, "ecommerce.snapshot"))
+        # Processes starting at the same time build the snapshot once, the others wait and open it
+        with _file_lock(snapshot_file):
+            if not os.path.exists(snapshot_file):
+                source = ColumnarDataLayer()
+                _load_json_files(source, data_path, stream=True)
+                write_snapshot(source, snapshot_file)
+        return MappedDataLayer(snapshot_file=snapshot_file)
+    raise ValueError(f"Unknown data backend: {backend}")
+
+def _load_json_files(data_layer: DataLayer, data_path: str, stream: bool):
+    data_layer.load_order_from_json(os.path.join(data_path, "orders.json"), stream=stream)
+    data_layer.load_supplier_from_json(os.path.join(data_path, "suppliers.json"), stream=stream)
+    data_layer.load_customer_from_json(os.path.join(data_path, "customers.json"), stream=stream)
+    data_layer.load_inventory_from_json(os.path.join(data_path, "inventory.json"), stream=stream)
+
+def prepare_shared_data(data_path: str):
+    """
+    Writes the files that the worker processes of a server share before they start, so they do not race
+    to create them: the snapshot of the mapped backend or the database of the sqlite backend.
+    Processes that call it at the same time build the files once, under a file lock.
+    The in-memory backends have nothing to prepare.
+    :param data_path (str): The directory holding the JSON files.
+    """
+    backend = os.getenv("DATA_BACKEND", "memory")
+    if backend not in ("sqlite", "mapped"):
+        return
+    if backend == "mapped":
+        # Builds the snapshot under its file lock if it does not exist yet
+        create_data_layer(data_path).close()
+        return
+    database_file = os.getenv("SQLITE_FILE", os.path.join(data_path, "ecommerce.db"))
+    with _file_lock(database_file):
+        data_layer = create_data_layer(data_path)
+        if not data_layer.has_data():
+            _load_json_files(data_layer, data_path, stream=True)
+        data_layer.close()
+
+def load_data_layer(data_path: str) -> DataLayer:
+    """
+    Creates a DataLayer and loads orders, suppliers, customers and inventory from the JSON files in data_path.
+    See create_data_layer for choosing the backend. A sqlite database that already holds data and a mapped
+    snapshot are used as is; delete the file to load the JSON files again.
+    Set ORDER_LOG_FILE to make order updates durable with a write-ahead log,
+    and ORDER_SNAPSHOT_EVERY to control how many updates are logged between snapshots.
+    Set DATA_RELOAD_INTERVAL to a number of seconds to reload changed supplier, customer and inventory files in the background.
+    SHARED_ORDER_LOG is set by run-workers.py and run-all.py when several processes serve the same data. The order log
+    is then shared between them and defaults to orders.wal in data_path, except for sqlite where the database itself is shared.
+    :param data_path (str): The directory holding the JSON files.
+    :return: The loaded data layer.
+    :rtype: DataLayer
+    """
+    data_layer = create_data_layer(data_path)
+    has_data = getattr(data_layer, "has_data", None)
+    if has_data is None or not has_data():
+        # Streaming keeps peak memory low for the backends that do not keep the models
+        _load_json_files(data_layer, data_path, stream=type(data_layer) is not DataLayer)
+    shared = os.getenv("SHARED_ORDER_LOG", "false").lower() == "true"
+    order_log_file = os.getenv("ORDER_LOG_FILE")
+    if shared and not order_log_file and os.getenv("DATA_BACKEND", "memory") != "sqlite":
+        # Every worker keeps the orders in its own memory, they exchange updates through the log
+        order_log_file = os.path.join(data_path, "orders.wal")
+    if order_log_file:
+        data_layer.open_order_log(order_log_file, snapshot_every=int(os.getenv("ORDER_SNAPSHOT_EVERY", "1000")), shared=shared)
+    reload_interval = float(os.getenv("DATA_RELOAD_INTERVAL", "0"))
+    if reload_interval > 0:
+        data_layer.watch_data_files(data_path, reload_interval)
+    return data_layer
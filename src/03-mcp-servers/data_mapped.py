@@ -0,0 +1,493 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from itertools import islice
+from typing import Callable, Iterator
+from pydantic import PrivateAttr
+
+from data_functions import DataLayer, NameIndex, replace_in_group, _check_page
+from data_functions import Product, Order, Supplier, Customer, ProductInventory, ProductStock
+from data_columnar import StringTable, OrderColumns
+
+# Binary snapshot layout: MAGIC | header offset (Q) | header length (Q) | sections | header JSON.
+# Every section is a flat array of one typecode, aligned to 8 bytes, so it can be used straight
+# from the mapped file through memoryview.cast. Strings are stored once in a blob with an offset
+# table and an open addressing hash table (crc32) that maps a string to its code.
+MAGIC = b"ECSNAP02"
+NONE = 0xFFFFFFFF
+PREFIX = struct.Struct("<8sQQ")
+
+def _csr(keys: array, size: int, keep: bytearray = None) -> tuple[array, array]:
+    """
+    Groups row numbers by key code: rows of key k are rows[offsets[k]:offsets[k + 1]], in row order.
+    Rows whose keep flag is 0 are left out, all rows are kept without keep.
+    """
+    offsets = array('Q', bytes(8 * (size + 1)))
+    for row, key in enumerate(keys):
+        if keep is None or keep[row]:
+            offsets[key + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    rows = array('I', bytes(4 * offsets[size]))
+    fill = array('Q', offsets)
+    for row, key in enumerate(keys):
+        if keep is None or keep[row]:
+            rows[fill[key]] = row
+            fill[key] += 1
+    return offsets, rows
+
+def _first_row_by_code(keys: array, size: int) -> array:
+    first = array('I', [NONE]) * size
+    for row, key in enumerate(keys):
+        if first[key] == NONE:
+            first[key] = row
+    return first
+
+def write_snapshot(data_layer: DataLayer, file_name: str):
+    """
+    Exports the data of any DataLayer into a binary snapshot file that MappedDataLayer opens with mmap.
+    The file is written to a temporary file of its own and renamed, so readers never see a partial snapshot
+    and processes that write the same snapshot at once do not write into each other's file.
+    Models are stored as JSON without their unset fields, which the models would reject as null.
+    :param data_layer (DataLayer): The data layer to export.
+    :param file_name (str): The name of the snapshot file.
+    """
+    strings = StringTable()
+
+    def code(value: str | None) -> int:
+        return NONE if value is None else strings.code(value)
+
+    sections = {}
+    product_codes = {}
+    product_json = array('I')
+    order_fields = {field: array('I') for field in OrderColumns.HEADER_FIELDS}
+    item_start, item_count, item_product = array('q'), array('I'), array('I')
+    for order in data_layer.orders or []:
+        for field, column in order_fields.items():
+            column.append(code(getattr(order, field)))
+        if order.order_items is None:
+            item_start.append(-1)
+            item_count.append(0)
+            continue
+        item_start.append(len(item_product))
+        item_count.append(len(order.order_items))
+        for product in order.order_items:
+            product_data = product.model_dump_json(exclude_none=True)
+            index = product_codes.get(product_data)
+            if index is None:
+                index = product_codes[product_data] = len(product_json)
+                product_json.append(code(product_data))
+            item_product.append(index)
+    for field, column in order_fields.items():
+        sections[f"order_{field}"] = column
+    sections.update(order_item_start=item_start, order_item_count=item_count, order_item_product=item_product, product_json=product_json)
+
+    inventory = {name: array('I') for name in ("inventory_product_id", "inventory_product_name", "inventory_location")}
+    inventory_volume = array('q')
+    for item in data_layer.inventory or []:
+        inventory["inventory_product_id"].append(code(item.product_id))
+        inventory["inventory_product_name"].append(code(item.product_name))
+        inventory["inventory_location"].append(code(item.location))
+        inventory_volume.append(item.volume)
+    sections.update(inventory, inventory_volume=inventory_volume)
+
+    customer_json, customer_ids, customer_names = array('I'), array('I'), array('I')
+    for customer in data_layer.customers or []:
+        customer_json.append(code(customer.model_dump_json(exclude_none=True)))
+        customer_ids.append(code(customer.customer_id))
+        customer_names.append(code(customer.customer_name))
+    supplier_json = array('I', (code(supplier.model_dump_json(exclude_none=True)) for supplier in data_layer.suppliers or []))
+    sections.update(customer_json=customer_json, customer_id=customer_ids, customer_name=customer_names, supplier_json=supplier_json)
+
+    size = len(strings.values)
+    order_ids = order_fields["order_id"]
+    first_order_rows = sections["order_row_by_id"] = _first_row_by_code(order_ids, size)
+    # Like the other backends, a customer lists only the first of several orders with the same ID
+    first_of_id = bytearray(first_order_rows[order_id] == row for row, order_id in enumerate(order_ids))
+    sections["customer_order_offsets"], sections["customer_order_rows"] = _csr(order_fields["customer_id"], size, first_of_id)
+    sections["inventory_offsets"], sections["inventory_rows"] = _csr(inventory["inventory_product_id"], size)
+    sections["customer_row_by_id"] = _first_row_by_code(customer_ids, size)
+    sections["customer_row_by_name"] = _first_row_by_code(customer_names, size)
+
+    encoded = [value.encode() for value in strings.values]
+    string_offsets = array('Q', [0])
+    for value in encoded:
+        string_offsets.append(string_offsets[-1] + len(value))
+    hash_size = 1
+    while hash_size < 2 * max(size, 1):
+        hash_size *= 2
+    string_hash = array('I', [NONE]) * hash_size
+    for string_code, value in enumerate(encoded):
+        slot = zlib.crc32(value) & (hash_size - 1)
+        while string_hash[slot] != NONE:
+            slot = (slot + 1) & (hash_size - 1)
+        string_hash[slot] = string_code
+    sections.update(string_offsets=string_offsets, string_blob=array('B', b"".join(encoded)), string_hash=string_hash)
+
+    directory_name, base_name = os.path.split(os.path.abspath(file_name))
+    with tempfile.NamedTemporaryFile(dir=directory_name, prefix=base_name + ".", suffix=".tmp", delete=False) as f:
+        try:
+            f.write(PREFIX.pack(MAGIC, 0, 0))
+            directory = {}
+            for name, values in sections.items():
+                f.write(bytes(-f.tell() % 8))
+                directory[name] = [f.tell(), values.typecode, len(values)]
+                f.write(values.tobytes())
+            header = json.dumps({"byteorder": sys.byteorder, "sections": directory}).encode()
+            header_offset = f.tell()
+            f.write(header)
+            f.seek(0)
+            f.write(PREFIX.pack(MAGIC, header_offset, len(header)))
+        except BaseException:
+            f.close()
+            os.remove(f.name)
+            raise
+    os.replace(f.name, file_name)
+
+class Snapshot:
+    """
+    A snapshot file mapped into memory. Every section is a memoryview on the mapping,
+    so nothing is copied or parsed when the file is opened; rows are decoded on access.
+    """
+
+    def __init__(self, file_name: str):
+        try:
+            with open(file_name, 'rb') as f:
+                self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (IOError, ValueError) as e:
+            raise ValueError(f"Error loading file: {e}")
+        magic, header_offset, header_length = PREFIX.unpack_from(self.mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a data snapshot: {file_name}")
+        header = json.loads(self.mmap[header_offset:header_offset + header_length])
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"Snapshot was written with {header['byteorder']} byte order")
+        view = memoryview(self.mmap)
+        self.sections = {}
+        for name, (offset, typecode, count) in header["sections"].items():
+            size = array(typecode).itemsize * count
+            self.sections[name] = view[offset:offset + size].cast(typecode)
+        view.release()
+        self.string_offsets = self.sections["string_offsets"]
+        self.string_blob = self.sections["string_blob"]
+        self.string_hash = self.sections["string_hash"]
+        self.order_headers = {field: self.sections[f"order_{field}"] for field in OrderColumns.HEADER_FIELDS}
+        self.order_ids = self.order_headers["order_id"]
+        self.products = {}
+
+    def close(self):
+        for section in self.sections.values():
+            section.release()
+        self.string_offsets = self.string_blob = self.string_hash = self.order_ids = None
+        self.order_headers = {}
+        self.sections = {}
+        self.mmap.close()
+
+    def string(self, code: int) -> str | None:
+        if code == NONE:
+            return None
+        offsets = self.string_offsets
+        return str(self.string_blob[offsets[code]:offsets[code + 1]], "utf-8")
+
+    def code(self, value: str) -> int | None:
+        key = value.encode()
+        offsets = self.string_offsets
+        blob = self.string_blob
+        table = self.string_hash
+        mask = len(table) - 1
+        slot = zlib.crc32(key) & mask
+        while True:
+            code = table[slot]
+            if code == NONE:
+                return None
+            if blob[offsets[code]:offsets[code + 1]] == key:
+                return code
+            slot = (slot + 1) & mask
+
+    def row(self, index: str, value: str) -> int | None:
+        """Looks up the first row with the value in a code to row section."""
+        code = self.code(value)
+        if code is None:
+            return None
+        row = self.sections[index][code]
+        return None if row == NONE else row
+
+    def rows(self, index: str, value: str) -> memoryview:
+        """Looks up all rows with the value in a pair of offsets and rows sections."""
+        rows = self.sections[f"{index}_rows"]
+        code = self.code(value)
+        if code is None:
+            return rows[0:0]
+        offsets = self.sections[f"{index}_offsets"]
+        return rows[offsets[code]:offsets[code + 1]]
+
+    def product(self, index: int) -> Product:
+        product = self.products.get(index)
+        if product is None:
+            product = Product.model_validate_json(self.string(self.sections["product_json"][index]))
+            self.products[index] = product
+        return product
+
+    def order_id_at(self, row: int) -> str:
+        return self.string(self.order_ids[row])
+
+    def order_at(self, row: int) -> Order:
+        string = self.string
+        fields = {field: string(column[row]) for field, column in self.order_headers.items()}
+        start = self.sections["order_item_start"][row]
+        if start >= 0:
+            products = self.sections["order_item_product"][start:start + self.sections["order_item_count"][row]]
+            fields["order_items"] = [self.product(index) for index in products]
+        else:
+            fields["order_items"] = None
+        return Order.model_construct(**fields)
+
+    def inventory_at(self, row: int) -> ProductInventory:
+        return ProductInventory.model_construct(
+            product_id=self.string(self.sections["inventory_product_id"][row]),
+            product_name=self.string(self.sections["inventory_product_name"][row]),
+            volume=self.sections["inventory_volume"][row],
+            location=self.string(self.sections["inventory_location"][row]),
+        )
+
+    def customer_at(self, row: int) -> Customer:
+        return Customer.model_validate_json(self.string(self.sections["customer_json"][row]))
+
+class MappedTable:
+    """Read-only view that materializes the rows of a snapshot section in order."""
+
+    def __init__(self, section: memoryview, row_to_model: Callable):
+        self.section = section
+        self.row_to_model = row_to_model
+
+    def __len__(self) -> int:
+        return len(self.section)
+
+    def __iter__(self) -> Iterator:
+        for row in range(len(self.section)):
+            yield self.row_to_model(row)
+
+class OrderOverlay:
+    """
+    Orders on top of a snapshot: updated orders replace their mapped rows, which are hidden.
+    After reset() every mapped row is hidden until an equal order is appended, so loading a set of
+    orders, e.g. an order log snapshot, only keeps the orders that differ from the mapped ones in memory.
+    """
+
+    def __init__(self, snapshot: Snapshot):
+        self.snapshot = snapshot
+        self.orders: dict[str, Order] = {}
+        self.orders_by_customer_id: dict[str, dict[str, Order]] = {}
+        self.hidden: set[str] = set()
+        # After reset() one flag per mapped row replaces the hidden IDs, None while all rows are visible
+        self.visible_rows: bytearray | None = None
+        self.visible_count = 0
+
+    def reset(self):
+        self.orders = {}
+        self.orders_by_customer_id = {}
+        self.hidden = set()
+        self.visible_rows = bytearray(len(self.snapshot.order_ids))
+        self.visible_count = 0
+
+    def _visible(self, row: int, order_id: str) -> bool:
+        if self.visible_rows is not None:
+            return bool(self.visible_rows[row])
+        return order_id not in self.hidden
+
+    def _hide(self, order_id: str):
+        row = self.snapshot.row("order_row_by_id", order_id)
+        if row is None:
+            return
+        if self.visible_rows is None:
+            self.hidden.add(order_id)
+        elif self.visible_rows[row]:
+            self.visible_rows[row] = 0
+            self.visible_count -= 1
+
+    def __len__(self) -> int:
+        if self.visible_rows is not None:
+            return self.visible_count + len(self.orders)
+        return len(self.snapshot.order_ids) - len(self.hidden) + len(self.orders)
+
+    def __iter__(self) -> Iterator[Order]:
+        snapshot = self.snapshot
+        for row in range(len(snapshot.order_ids)):
+            if self._visible(row, snapshot.order_id_at(row)):
+                yield snapshot.order_at(row)
+        yield from list(self.orders.values())
+
+    def get(self, order_id: str) -> Order:
+        order = self.orders.get(order_id)
+        if order is not None:
+            return order
+        row = self.snapshot.row("order_row_by_id", order_id)
+        if row is None or not self._visible(row, order_id):
+            return None
+        return self.snapshot.order_at(row)
+
+    def iter_by_customer_id(self, customer_id: str) -> Iterator[Order]:
+        snapshot = self.snapshot
+        for row in snapshot.rows("customer_order", customer_id):
+            if self._visible(row, snapshot.order_id_at(row)):
+                yield snapshot.order_at(row)
+        yield from self.orders_by_customer_id.get(customer_id, {}).values()
+
+    def append(self, order: Order):
+        if self.get(order.order_id) is not None:
+            return
+        if self.visible_rows is not None:
+            row = self.snapshot.row("order_row_by_id", order.order_id)
+            if row is not None and self.snapshot.order_at(row) == order:
+                # Unchanged since the snapshot, served from the mapped row
+                self.visible_rows[row] = 1
+                self.visible_count += 1
+                return
+        self.orders[order.order_id] = order
+        self.orders_by_customer_id.setdefault(order.customer_id, {})[order.order_id] = order
+
+    def replace(self, order_id: str, previous: Order, order: Order):
+        replace_in_group(self.orders_by_customer_id, previous.customer_id, order_id, order.customer_id, order.order_id, order)
+        # The new version is visible before the mapped row is hidden, so readers never miss the order
+        self.orders[order.order_id] = order
+        for hidden in (order_id, order.order_id):
+            self._hide(hidden)
+        if order_id != order.order_id:
+            self.orders.pop(order_id, None)
+
+class MappedDataLayer(DataLayer):
+    """
+    Read-mostly DataLayer served straight from a binary snapshot opened with mmap.
+    Opening only maps the file, so cold start does not depend on the data size, and all processes
+    that open the same snapshot share its pages through the OS page cache.
+    Orders, customers and inventory are materialized from the mapped columns when they are queried.
+    Suppliers are small and are loaded into memory. Order updates are kept in an in-memory overlay
+    on top of the snapshot; open the order log to make them durable.
+    Create snapshots with write_snapshot. Customers and inventory cannot be reloaded; write a new snapshot instead.
+    """
+
+    snapshot_file: str
+
+    _snapshot: Snapshot = PrivateAttr(default=None)
+
+    def model_post_init(self, __context):
+        snapshot = self._snapshot = Snapshot(self.snapshot_file)
+        self.orders = OrderOverlay(snapshot)
+        self.customers = MappedTable(snapshot.sections["customer_json"], snapshot.customer_at)
+        self.inventory = MappedTable(snapshot.sections["inventory_volume"], snapshot.inventory_at)
+        self.suppliers = [Supplier.model_validate_json(snapshot.string(code)) for code in snapshot.sections["supplier_json"]]
+        self._index_suppliers()
+        # The name search index is built from the snapshot on first use
+        self._customer_names = None
+        print("Mapped snapshot:", self.snapshot_file)
+
+    def has_data(self) -> bool:
+        return True
+
+    def close(self):
+        """
+        Closes the order log and unmaps the snapshot file.
+        """
+        self.close_order_log()
+        self._snapshot.close()
+
+    def _index_customers(self):
+        if not isinstance(self.customers, MappedTable):
+            self._reset_customer_index()
+
+    def _reset_customer_index(self):
+        raise ValueError("Customers of a mapped snapshot are read-only, write a new snapshot instead")
+
+    def _index_inventory(self):
+        if not isinstance(self.inventory, MappedTable):
+            self._reset_inventory_index()
+
+    def _reset_inventory_index(self):
+        raise ValueError("Inventory of a mapped snapshot is read-only, write a new snapshot instead")
+
+    def _reload(self, loader: str, file_name: str, stream: bool, swap):
+        raise ValueError("A mapped snapshot cannot be reloaded, write a new snapshot and restart instead")
+
+    def _index_orders(self):
+        orders = self.orders
+        if isinstance(orders, OrderOverlay):
+            return
+        self._reset_order_index()
+        for order in orders or []:
+            self._append_order(order)
+
+    def _reset_order_index(self):
+        # Loaded orders, e.g. from an order log snapshot, replace the mapped ones; only those that differ are kept in memory
+        self._version += 1
+        overlay = OrderOverlay(self._snapshot)
+        overlay.reset()
+        self.orders = overlay
+
+    def _append_order(self, order: Order):
+        self.orders.append(order)
+
+    def get_customer_by_id(self, customer_id: str) -> Customer:
+        row = self._snapshot.row("customer_row_by_id", customer_id)
+        return None if row is None else self._snapshot.customer_at(row)
+
+    def get_customer_by_name(self, customer_name: str) -> Customer:
+        row = self._snapshot.row("customer_row_by_name", customer_name)
+        return None if row is None else self._snapshot.customer_at(row)
+
+    def _customer_name_index(self) -> NameIndex:
+        index = self._customer_names
+        if index is None:
+            snapshot = self._snapshot
+            index = NameIndex()
+            for customer_id, customer_name in zip(snapshot.sections["customer_id"], snapshot.sections["customer_name"]):
+                index.add(snapshot.string(customer_id), snapshot.string(customer_name))
+            self._customer_names = index
+        return index
+
+    def get_order_by_id(self, order_id: str) -> Order:
+        return self.orders.get(order_id)
+
+    def iter_orders_by_customer_id(self, customer_id: str) -> Iterator[Order]:
+        return self.orders.iter_by_customer_id(customer_id)
+
+    def get_orders_by_customer_id(self, customer_id: str) -> list[Order]:
+        return list(self.iter_orders_by_customer_id(customer_id))
+
+    def get_orders_by_customer_id_page(self, customer_id: str, offset: int = 0, limit: int = 50) -> list[Order]:
+        _check_page(offset, limit)
+        return list(islice(self.iter_orders_by_customer_id(customer_id), offset, offset + limit))
+
+    def _order_exists(self, order_id: str) -> bool:
+        return self.orders.get(order_id) is not None
+
+    def _apply_order_update(self, order_id: str, order_data: Order) -> bool:
+        previous = self.orders.get(order_id)
+        if previous is None or self._renames_onto_other_order(order_id, order_data):
+            return False
+        self.orders.replace(order_id, previous, order_data)
+        self._version += 1
+        return True
+
+    def get_inventory_by_product_id(self, product_id: str) -> list[ProductInventory]:
+        snapshot = self._snapshot
+        return [snapshot.inventory_at(row) for row in snapshot.rows("inventory", product_id)]
+
+    def _stock_for(self, product_id: str) -> dict[str, int]:
+        snapshot = self._snapshot
+        locations = snapshot.sections["inventory_location"]
+        volumes = snapshot.sections["inventory_volume"]
+        stock = {}
+        for row in snapshot.rows("inventory", product_id):
+            location = snapshot.string(locations[row])
+            stock[location] = stock.get(location, 0) + volumes[row]
+        return stock
+
+    def get_all_stock(self) -> list[ProductStock]:
+        snapshot = self._snapshot
+        product_codes = dict.fromkeys(snapshot.sections["inventory_product_id"])
+        return [self.get_stock_by_product_id(snapshot.string(code)) for code in product_codes]
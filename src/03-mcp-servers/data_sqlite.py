@@ -0,0 +1,341 @@
+import sqlite3
+import threading
+from typing import Callable, Iterator
+from pydantic import PrivateAttr
+
+from data_functions import DataLayer, NameIndex, _check_page
+from data_functions import Discount, Product, Order, Supplier, Customer, ProductInventory, ProductStock
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS suppliers (supplier_id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS products (product_id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS discounts (discount_id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS customers (customer_id TEXT PRIMARY KEY, customer_name TEXT NOT NULL, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS customers_by_name ON customers (customer_name);
+CREATE TABLE IF NOT EXISTS orders (order_id TEXT PRIMARY KEY, customer_id TEXT NOT NULL, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS orders_by_customer ON orders (customer_id);
+CREATE TABLE IF NOT EXISTS inventory (product_id TEXT NOT NULL, product_name TEXT NOT NULL, volume INTEGER NOT NULL, location TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS inventory_by_product ON inventory (product_id);
+"""
+
+class SqliteTable:
+    """
+    Read-only view of a table that iterates its rows as models in insertion order.
+    len() counts through the writer connection so it includes rows of a load that is still in progress.
+    """
+
+    def __init__(self, data_layer: "SqliteDataLayer", query: str, to_model: Callable):
+        self.data_layer = data_layer
+        self.query = query
+        self.to_model = to_model
+
+    def __len__(self) -> int:
+        return self.data_layer._writer.execute(f"SELECT COUNT(*) FROM ({self.query})").fetchone()[0]
+
+    def __iter__(self) -> Iterator:
+        for row in self.data_layer._reader().execute(self.query):
+            yield self.to_model(row)
+
+def _inventory_from_row(row: tuple) -> ProductInventory:
+    return ProductInventory(product_id=row[0], product_name=row[1], volume=row[2], location=row[3])
+
+class SqliteDataLayer(DataLayer):
+    """
+    DataLayer stored in a local SQLite file instead of memory, for datasets that do not fit in RAM.
+    The database runs in WAL mode with indexes on customer_id, order_id, product_id and customer_name.
+    Every thread reads through its own connection, so readers run concurrently and never block the writer.
+    Writes go through one connection and are serialized by the write lock.
+    The data lists are replaced by read-only views on the tables. Rows hold the JSON of the models
+    without their unset fields, which the models would reject as null when they are read back.
+    The data version also changes on commits of other processes that share the database file.
+    """
+
+    database_file: str
+
+    _writer: sqlite3.Connection = PrivateAttr(default=None)
+    _local: threading.local = PrivateAttr(default_factory=threading.local)
+    _views: dict[str, SqliteTable] = PrivateAttr(default_factory=dict)
+    _customer_generation: int = PrivateAttr(default=0)
+    _monitor: sqlite3.Connection = PrivateAttr(default=None)
+    _monitor_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context):
+        self._writer = self._connect()
+        # Never writes, so its PRAGMA data_version changes on every commit, of this process or another one
+        self._monitor = self._connect()
+        self._writer.executescript(SCHEMA)
+        self._writer.commit()
+        self._views = {
+            "suppliers": SqliteTable(self, "SELECT data FROM suppliers ORDER BY rowid", lambda row: Supplier.model_validate_json(row[0])),
+            "customers": SqliteTable(self, "SELECT data FROM customers ORDER BY rowid", lambda row: Customer.model_validate_json(row[0])),
+            "orders": SqliteTable(self, "SELECT data FROM orders ORDER BY rowid", lambda row: Order.model_validate_json(row[0])),
+            "inventory": SqliteTable(self, "SELECT product_id, product_name, volume, location FROM inventory ORDER BY rowid", _inventory_from_row),
+        }
+        self.suppliers = self._views["suppliers"]
+        self.customers = self._views["customers"]
+        self.orders = self._views["orders"]
+        self.inventory = self._views["inventory"]
+        # The name search index is built from the table on first use
+        self._customer_names = None
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.database_file, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    @property
+    def data_version(self) -> int:
+        """
+        A counter that is bumped whenever the data changes, here or in another process writing the same database file.
+        Combines the counter of this process with the commit counter of the database.
+        """
+        with self._monitor_lock:
+            database_version = self._monitor.execute("PRAGMA data_version").fetchone()[0]
+        return (self._version << 32) | (database_version & 0xFFFFFFFF)
+
+    def has_data(self) -> bool:
+        """
+        Checks whether the database already holds orders, e.g. from an earlier run.
+        :return: True if there is at least one order.
+        :rtype: bool
+        """
+        return self._reader().execute("SELECT 1 FROM orders LIMIT 1").fetchone() is not None
+
+    def close(self):
+        """
+        Closes the writer connection and the reader connection of the calling thread.
+        """
+        self.close_order_log()
+        self._writer.close()
+        with self._monitor_lock:
+            self._monitor.close()
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    # Loading: the base loaders fill the tables through the index hooks inside one transaction
+
+    def load_supplier_from_json(self, file_name: str, fast: bool = False, stream: bool = False):
+        with self._write_lock, self._writer:
+            super().load_supplier_from_json(file_name, fast, stream)
+
+    def load_customer_from_json(self, file_name: str, fast: bool = False, stream: bool = False):
+        with self._write_lock, self._writer:
+            super().load_customer_from_json(file_name, fast, stream)
+        # A search during the load may have indexed the rows from before the commit
+        self._forget_customer_names()
+
+    def load_order_from_json(self, file_name: str, fast: bool = False, stream: bool = False):
+        with self._write_lock, self._writer:
+            super().load_order_from_json(file_name, fast, stream)
+
+    def load_inventory_from_json(self, file_name: str, fast: bool = False, stream: bool = False):
+        with self._write_lock, self._writer:
+            super().load_inventory_from_json(file_name, fast, stream)
+
+    def rebuild_indexes(self):
+        with self._write_lock, self._writer:
+            super().rebuild_indexes()
+
+    def _reload(self, loader: str, file_name: str, stream: bool, swap):
+        # The loader replaces the rows in one transaction, so readers see the old rows until it commits
+        # and a failed load is rolled back. Order updates wait for the reload to finish.
+        getattr(self, loader)(file_name, stream=stream)
+
+    def _index_suppliers(self):
+        suppliers = self.suppliers
+        if isinstance(suppliers, SqliteTable):
+            return
+        self._reset_supplier_index()
+        for supplier in suppliers or []:
+            self._append_supplier(supplier)
+
+    def _reset_supplier_index(self):
+        self._version += 1
+        self._writer.execute("DELETE FROM suppliers")
+        self._writer.execute("DELETE FROM products")
+        self._writer.execute("DELETE FROM discounts")
+        self.suppliers = self._views["suppliers"]
+
+    def _append_supplier(self, supplier: Supplier):
+        self._writer.execute("INSERT OR IGNORE INTO suppliers VALUES (?, ?)", (supplier.supplier_id, supplier.model_dump_json(exclude_none=True)))
+        self._writer.executemany(
+            "INSERT OR IGNORE INTO products VALUES (?, ?)",
+            ((product.product_id, product.model_dump_json(exclude_none=True)) for product in supplier.products or []),
+        )
+        self._writer.executemany(
+            "INSERT OR IGNORE INTO discounts VALUES (?, ?)",
+            ((discount.discount_id, discount.model_dump_json(exclude_none=True)) for discount in supplier.discounts or []),
+        )
+
+    def _build_catalogs(self):
+        pass
+
+    def _index_customers(self):
+        customers = self.customers
+        if isinstance(customers, SqliteTable):
+            return
+        self._reset_customer_index()
+        for customer in customers or []:
+            self._append_customer(customer)
+
+    def _reset_customer_index(self):
+        self._version += 1
+        self._writer.execute("DELETE FROM customers")
+        self.customers = self._views["customers"]
+        self._forget_customer_names()
+
+    def _forget_customer_names(self):
+        self._customer_generation += 1
+        self._customer_names = None
+
+    def _append_customer(self, customer: Customer):
+        self._writer.execute(
+            "INSERT OR IGNORE INTO customers VALUES (?, ?, ?)",
+            (customer.customer_id, customer.customer_name, customer.model_dump_json(exclude_none=True)),
+        )
+
+    def _index_orders(self):
+        orders = self.orders
+        if isinstance(orders, SqliteTable):
+            return
+        self._reset_order_index()
+        for order in orders or []:
+            self._append_order(order)
+
+    def _reset_order_index(self):
+        self._version += 1
+        self._writer.execute("DELETE FROM orders")
+        self.orders = self._views["orders"]
+
+    def _append_order(self, order: Order):
+        self._writer.execute(
+            "INSERT OR IGNORE INTO orders VALUES (?, ?, ?)",
+            (order.order_id, order.customer_id, order.model_dump_json(exclude_none=True)),
+        )
+
+    def _index_inventory(self):
+        inventory = self.inventory
+        if isinstance(inventory, SqliteTable):
+            return
+        self._reset_inventory_index()
+        for item in inventory or []:
+            self._append_inventory(item)
+
+    def _reset_inventory_index(self):
+        self._version += 1
+        self._writer.execute("DELETE FROM inventory")
+        self.inventory = self._views["inventory"]
+
+    def _append_inventory(self, item: ProductInventory):
+        self._writer.execute(
+            "INSERT INTO inventory VALUES (?, ?, ?, ?)",
+            (item.product_id, item.product_name, item.volume, item.location),
+        )
+
+    # Queries
+
+    def _fetch_model(self, query: str, params: tuple, model):
+        row = self._reader().execute(query, params).fetchone()
+        return None if row is None else model.model_validate_json(row[0])
+
+    def get_supplier_by_id(self, supplier_id: str) -> Supplier:
+        return self._fetch_model("SELECT data FROM suppliers WHERE supplier_id = ?", (supplier_id,), Supplier)
+
+    def get_customer_by_id(self, customer_id: str) -> Customer:
+        return self._fetch_model("SELECT data FROM customers WHERE customer_id = ?", (customer_id,), Customer)
+
+    def get_customer_by_name(self, customer_name: str) -> Customer:
+        return self._fetch_model("SELECT data FROM customers WHERE customer_name = ? ORDER BY rowid LIMIT 1", (customer_name,), Customer)
+
+    def _customer_name_index(self) -> NameIndex:
+        index = self._customer_names
+        if index is None:
+            generation = self._customer_generation
+            index = NameIndex()
+            for customer_id, customer_name in self._reader().execute("SELECT customer_id, customer_name FROM customers ORDER BY rowid"):
+                index.add(customer_id, customer_name)
+            # Only keep the index if the customers were not replaced while it was built
+            if generation == self._customer_generation:
+                self._customer_names = index
+        return index
+
+    def get_order_by_id(self, order_id: str) -> Order:
+        return self._fetch_model("SELECT data FROM orders WHERE order_id = ?", (order_id,), Order)
+
+    def get_orders_by_customer_id(self, customer_id: str) -> list[Order]:
+        return list(self.iter_orders_by_customer_id(customer_id))
+
+    def iter_orders_by_customer_id(self, customer_id: str) -> Iterator[Order]:
+        rows = self._reader().execute("SELECT data FROM orders WHERE customer_id = ? ORDER BY rowid", (customer_id,))
+        for row in rows:
+            yield Order.model_validate_json(row[0])
+
+    def get_orders_by_customer_id_page(self, customer_id: str, offset: int = 0, limit: int = 50) -> list[Order]:
+        _check_page(offset, limit)
+        rows = self._reader().execute(
+            "SELECT data FROM orders WHERE customer_id = ? ORDER BY rowid LIMIT ? OFFSET ?",
+            (customer_id, limit, offset),
+        )
+        return [Order.model_validate_json(row[0]) for row in rows]
+
+    def get_all_products(self) -> list[Product]:
+        rows = self._reader().execute("SELECT data FROM products ORDER BY rowid")
+        return [Product.model_validate_json(row[0]) for row in rows]
+
+    def get_product_by_id(self, product_id: str) -> Product:
+        return self._fetch_model("SELECT data FROM products WHERE product_id = ?", (product_id,), Product)
+
+    def get_all_discounts(self) -> list[Discount]:
+        rows = self._reader().execute("SELECT data FROM discounts ORDER BY rowid")
+        return [Discount.model_validate_json(row[0]) for row in rows]
+
+    def _order_exists(self, order_id: str) -> bool:
+        return self._writer.execute("SELECT 1 FROM orders WHERE order_id = ?", (order_id,)).fetchone() is not None
+
+    def _apply_order_update(self, order_id: str, order_data: Order) -> bool:
+        try:
+            with self._writer:
+                cursor = self._writer.execute(
+                    "UPDATE orders SET order_id = ?, customer_id = ?, data = ? WHERE order_id = ?",
+                    (order_data.order_id, order_data.customer_id, order_data.model_dump_json(exclude_none=True), order_id),
+                )
+        except sqlite3.IntegrityError:
+            return False
+        self._version += 1
+        return cursor.rowcount > 0
+
+    def get_inventory_by_product_id(self, product_id: str) -> list[ProductInventory]:
+        rows = self._reader().execute(
+            "SELECT product_id, product_name, volume, location FROM inventory WHERE product_id = ? ORDER BY rowid",
+            (product_id,),
+        )
+        return [_inventory_from_row(row) for row in rows]
+
+    def _stock_for(self, product_id: str) -> dict[str, int]:
+        rows = self._reader().execute(
+            "SELECT location, SUM(volume) FROM inventory WHERE product_id = ? GROUP BY location ORDER BY MIN(rowid)",
+            (product_id,),
+        )
+        return dict(rows.fetchall())
+
+    def get_all_stock(self) -> list[ProductStock]:
+        rows = self._reader().execute(
+            "SELECT product_id, location, SUM(volume) FROM inventory GROUP BY product_id, location ORDER BY MIN(rowid)"
+        )
+        stock = {}
+        for product_id, location, volume in rows:
+            stock.setdefault(product_id, {})[location] = volume
+        return [
+            ProductStock(product_id=product_id, total_volume=sum(locations.values()), volume_by_location=locations)
+            for product_id, locations in stock.items()
+        ]
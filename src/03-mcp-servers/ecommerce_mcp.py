@@ -0,0 +1,455 @@
+import asyncio
+import fnmatch
+import os
+import threading
+import weakref
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from io import TextIOWrapper
+from typing import Annotated, TextIO
+
+import anyio
+from fastmcp import Context, FastMCP
+from mcp.server.lowlevel import NotificationOptions
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from mcp.server.session import ServerSession
+from mcp.server.stdio import stdio_server
+from mcp.types import TextContent
+from pydantic import Field, TypeAdapter
+from starlette.applications import Starlette
+
+from data_functions import DataLayer, MAX_BATCH_SIZE
+from data_functions import Discount, Product, Order, Customer, CustomerMatch, ProductInventory, ProductStock, CatalogPage
+
+# The e-commerce MCP server, shared by server-mcp-http.py, server-mcp-sse-customers.py,
+# server-mcp-stdio-customers.py and server-mcp-ecommerce.py. One server can be served on
+# several transports at once, all of them reading the same data layer.
+
+# The IDs of a batch tool call, a longer list fails validation like a batch request of server-openapi.py
+BatchIds = Annotated[list[str], Field(max_length=MAX_BATCH_SIZE)]
+
+class ResourceCache:
+    """
+    Serialized contents of resource reads keyed by URI. An entry is valid for one data version of the
+    data layer, so any write to the data invalidates it, and for at most ttl seconds.
+    Beyond max_entries the least recently read entries are evicted.
+    """
+
+    def __init__(self, data_layer: DataLayer, max_entries: int = 1024, ttl: float = 60.0):
+        self.data_layer = data_layer
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[int, float, list[ReadResourceContents]]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, uri: str) -> list[ReadResourceContents] | None:
+        """
+        Gets the cached contents of a resource.
+        :param uri (str): The URI of the resource.
+        :return: The contents, or None if they are not cached or no longer valid.
+        :rtype: list[ReadResourceContents] | None
+        """
+        with self.lock:
+            entry = self.entries.get(uri)
+            if entry is not None:
+                version, expires, contents = entry
+                if version != self.data_layer.data_version:
+                    self.invalidations += 1
+                elif expires < time.monotonic():
+                    self.expirations += 1
+                else:
+                    self.hits += 1
+                    self.entries.move_to_end(uri)
+                    return contents
+                del self.entries[uri]
+            self.misses += 1
+            return None
+
+    def put(self, uri: str, version: int, contents: list[ReadResourceContents]):
+        """
+        Caches the contents of a resource.
+        :param uri (str): The URI of the resource.
+        :param version (int): The data version the contents were read at, taken before reading them.
+        :param contents (list[ReadResourceContents]): The contents.
+        """
+        with self.lock:
+            self.entries[uri] = (version, time.monotonic() + self.ttl, contents)
+            self.entries.move_to_end(uri)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def metrics(self) -> dict:
+        with self.lock:
+            reads = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / reads if reads else 0.0,
+                "invalidations": self.invalidations,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+class CachedFastMCP(FastMCP):
+    """A FastMCP server that answers repeated resource reads from a ResourceCache."""
+
+    def __init__(self, *args, resource_cache: ResourceCache | None = None, uncached: set[str] = frozenset(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.resource_cache = resource_cache
+        self.uncached = uncached
+
+    async def _mcp_read_resource(self, uri) -> list[ReadResourceContents]:
+        key = str(uri)
+        if self.resource_cache is None or key in self.uncached:
+            return await super()._mcp_read_resource(uri)
+        contents = self.resource_cache.get(key)
+        if contents is None:
+            version = self.resource_cache.data_layer.data_version
+            contents = await super()._mcp_read_resource(uri)
+            self.resource_cache.put(key, version, contents)
+        return contents
+
+class ResourceSubscriptions:
+    """
+    Keeps the resource URIs clients subscribed to and sends them a resources/updated notification
+    when the data layer reports a change of the data behind the URI. Clients then read the resource
+    again instead of polling it. Sessions that closed are dropped on their next notification.
+    """
+
+    # The resources that depend on each kind of data, {id} stands for the IDs of the changed items
+    DEPENDENCIES = {
+        "orders": ["resource://orders/{id}/order", "resource://orders/{id}/locations"],
+        "inventory": ["resource://inventory/stock", "resource://inventory/{id}/productinventory",
+                      "resource://inventory/{id}/stock", "resource://orders/{id}/locations"],
+        "suppliers": ["resource://products/products", "resource://discounts/discount"],
+        "customers": ["resource://customers/{id}/customer", "resource://inventory/{id}/location"],
+    }
+
+    def __init__(self, data_layer: DataLayer):
+        self.data_layer = data_layer
+        # Subscribed URI to the sessions and the event loops serving them
+        self.subscribers: dict[str, weakref.WeakKeyDictionary[ServerSession, asyncio.AbstractEventLoop]] = {}
+        self.lock = threading.Lock()
+        data_layer.add_change_listener(self.on_change)
+
+    def subscribe(self, uri: str, session: ServerSession):
+        with self.lock:
+            self.subscribers.setdefault(uri, weakref.WeakKeyDictionary())[session] = asyncio.get_running_loop()
+
+    def unsubscribe(self, uri: str, session: ServerSession):
+        with self.lock:
+            sessions = self.subscribers.get(uri)
+            if sessions is not None:
+                sessions.pop(session, None)
+                if not sessions:
+                    del self.subscribers[uri]
+
+    def changed_uris(self, kind: str, ids: set[str] | None) -> list[str]:
+        """
+        Finds the subscribed URIs whose resources depend on changed data.
+        :param kind (str): The kind of data that changed, see DataLayer.add_change_listener.
+        :param ids (set[str] | None): The IDs of the changed items, None if all of them may have changed.
+        :return: The subscribed URIs to notify.
+        :rtype: list[str]
+        """
+        with self.lock:
+            subscribed = set(self.subscribers)
+        changed = set()
+        for template in self.DEPENDENCIES.get(kind, []):
+            if "{id}" not in template:
+                changed.update(uri for uri in subscribed if uri == template)
+            elif ids is None:
+                pattern = template.replace("{id}", "*")
+                changed.update(uri for uri in subscribed if fnmatch.fnmatchcase(uri, pattern))
+            else:
+                changed.update(uri for uri in (template.replace("{id}", id) for id in ids) if uri in subscribed)
+        return sorted(changed)
+
+    def on_change(self, kind: str, ids: set[str] | None):
+        # Runs in the thread that changed the data, the notifications are sent on the loops of the sessions
+        for uri in self.changed_uris(kind, ids):
+            with self.lock:
+                sessions = list(self.subscribers.get(uri, {}).items())
+            for session, loop in sessions:
+                if not loop.is_closed():
+                    asyncio.run_coroutine_threadsafe(self.notify(uri, session), loop)
+
+    async def notify(self, uri: str, session: ServerSession):
+        try:
+            await session.send_resource_updated(uri)
+        except Exception:
+            # The client is gone
+            self.unsubscribe(uri, session)
+
+    def register(self, mcp: FastMCP):
+        """
+        Registers the subscribe and unsubscribe handlers with the MCP server and announces the subscribe capability.
+        :param mcp (FastMCP): The MCP server.
+        """
+        server = mcp._mcp_server
+
+        @server.subscribe_resource()
+        async def subscribe_resource(uri):
+            self.subscribe(str(uri), server.request_context.session)
+
+        @server.unsubscribe_resource()
+        async def unsubscribe_resource(uri):
+            self.unsubscribe(str(uri), server.request_context.session)
+
+        # The MCP server announces resources without subscriptions even if it handles them
+        get_capabilities = server.get_capabilities
+
+        def get_capabilities_with_subscribe(*args, **kwargs):
+            capabilities = get_capabilities(*args, **kwargs)
+            if capabilities.resources is not None:
+                capabilities.resources.subscribe = True
+            return capabilities
+
+        server.get_capabilities = get_capabilities_with_subscribe
+
+products_adapter = TypeAdapter(list[Product])
+discounts_adapter = TypeAdapter(list[Discount])
+
+async def serialize_with_progress(ctx: Context, items: list, adapter: TypeAdapter, chunk_size: int = 500) -> TextContent:
+    """
+    Serializes a long list to a JSON array chunk by chunk. After every chunk it reports the progress to clients
+    that sent a progress token and lets the event loop serve other requests, so a large result does not stall the server.
+    The whole result is still held in memory, the page tools are the way to bound it.
+    :param ctx (Context): The context of the tool call.
+    :param items (list): The items to serialize.
+    :param adapter (TypeAdapter): The adapter of the list type.
+    :param chunk_size (int): The number of items serialized at once.
+    :return: The JSON array.
+    :rtype: TextContent
+    """
+    total = len(items)
+    chunks = []
+    for start in range(0, total, chunk_size):
+        # Each chunk is an array, its brackets are stripped to join the chunks into one array
+        chunks.append(adapter.dump_json(items[start:start + chunk_size])[1:-1])
+        await ctx.report_progress(min(start + chunk_size, total), total)
+        await asyncio.sleep(0)
+    return TextContent(type="text", text="[" + b",".join(chunks).decode() + "]")
+
+def create_mcp(data_layer: DataLayer, stateless_http: bool = False) -> FastMCP:
+    """
+    Creates the e-commerce MCP server with its tools and resources on top of a data layer.
+    Lookups are offered both as resources and as tools, for clients that only call tools.
+    Resource reads are cached per URI until the data changes, configured with the environment variables
+    MCP_CACHE_SIZE (default 1024 entries, 0 disables the cache) and MCP_CACHE_TTL (default 60 seconds).
+    The counters of the cache are served as resource://metrics/cache.
+    Clients can subscribe to resources and are notified when an order update, a followed update of another
+    process or a data reload changes them.
+    :param data_layer (DataLayer): The data layer the tools and resources read and update.
+    :param stateless_http (bool): Whether streamable HTTP requests are answered without a session, needed with several workers.
+    :return: The MCP server.
+    :rtype: FastMCP
+    """
+    cache_size = int(os.getenv("MCP_CACHE_SIZE", "1024"))
+    resource_cache = ResourceCache(data_layer, cache_size, float(os.getenv("MCP_CACHE_TTL", "60"))) if cache_size > 0 else None
+    mcp = CachedFastMCP("EcommerceAPIs", "1.0.0", stateless_http=stateless_http,
+                        resource_cache=resource_cache, uncached={"resource://metrics/cache"})
+    ResourceSubscriptions(data_layer).register(mcp)
+
+    @mcp.resource("resource://metrics/cache")
+    def get_cache_metrics() -> dict:
+        """Gets the hit and miss counters of the resource cache"""
+        if resource_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **resource_cache.metrics()}
+
+    @mcp.resource("config://version")
+    def get_version() -> dict:
+        return {
+            "version": "1.2.0",
+            "features": ["tools", "resources"],
+        }
+
+    @mcp.tool()
+    @mcp.resource("resource://customers/{customer_id}/customer")
+    async def get_customer_by_id(customer_id: str) -> Customer:
+        """Gets details of a customer by customer id"""
+        return data_layer.get_customer_by_id(customer_id)
+
+    @mcp.tool()
+    @mcp.resource("resource://customers/{customer_name}/customer")
+    async def get_customer_by_name(customer_name: str) -> Customer:
+        """Gets details of a customer by name"""
+        return data_layer.get_customer_by_name(customer_name)
+
+    @mcp.resource("resource://products/products")
+    async def get_all_products() -> list[Product]:
+        """Gets all products"""
+        return data_layer.get_all_products()
+
+    @mcp.tool(name="get_all_products")
+    async def get_all_products_tool(ctx: Context) -> TextContent:
+        """Gets all products. For large catalogs use get_products_page to fetch them page by page."""
+        return await serialize_with_progress(ctx, data_layer.get_all_products(), products_adapter)
+
+    @mcp.resource("resource://discounts/discount")
+    async def get_all_discounts() -> list[Discount]:
+        """Gets all discounts"""
+        return data_layer.get_all_discounts()
+
+    @mcp.tool(name="get_all_discounts")
+    async def get_all_discounts_tool(ctx: Context) -> TextContent:
+        """Gets all discounts. For large catalogs use get_discounts_page to fetch them page by page."""
+        return await serialize_with_progress(ctx, data_layer.get_all_discounts(), discounts_adapter)
+
+    @mcp.tool()
+    @mcp.resource("resource://orders/{order_id}/order")
+    async def get_order_by_id(order_id: str) -> Order:
+        """Gets details of an order by ID"""
+        return data_layer.get_order_by_id(order_id)
+
+    @mcp.tool()
+    async def update_order(order_id: str, order: Order) -> bool:
+        """Updates an existing order by referencing the order ID"""
+        print("received order update")
+        return data_layer.update_order(order_id, order)
+
+    @mcp.tool()
+    async def search_customers(query: str, limit: int = 10) -> list[CustomerMatch]:
+        """Searches customers by a full or partial name, ignoring case and small typos. Returns the best matches first with a score between 0 and 1, use it when the exact name is not known."""
+        return data_layer.search_customers(query, max(1, min(limit, 100)))
+
+    @mcp.tool()
+    async def get_products_page(cursor: str | None = None, limit: int = 50, fields: list[str] | None = None) -> CatalogPage:
+        """Gets one page of the product catalog. Pass the next_cursor of a page to get the following page, it is null on the last page.
+        Use fields to return only some product fields, e.g. ["product_id", "list_price"]."""
+        return data_layer.get_products_page(cursor, max(1, min(limit, 500)), fields)
+
+    @mcp.tool()
+    async def get_discounts_page(cursor: str | None = None, limit: int = 50, fields: list[str] | None = None) -> CatalogPage:
+        """Gets one page of the discount catalog. Pass the next_cursor of a page to get the following page, it is null on the last page.
+        Use fields to return only some discount fields, e.g. ["discount_id", "product_id", "discount_price"]."""
+        return data_layer.get_discounts_page(cursor, max(1, min(limit, 500)), fields)
+
+    @mcp.tool()
+    async def get_orders_page(customer_id: str, cursor: str | None = None, limit: int = 50, fields: list[str] | None = None) -> CatalogPage:
+        """Gets one page of the orders of a customer. Pass the next_cursor of a page to get the following page, it is null on the last page.
+        Use fields to return only some order fields, e.g. ["order_id", "order_status"]."""
+        return data_layer.get_orders_page(customer_id, cursor, max(1, min(limit, 500)), fields)
+
+    @mcp.tool()
+    async def get_customers_by_ids(customer_ids: BatchIds) -> list[Customer]:
+        """Gets details of several customers by their IDs in one call. Unknown IDs are skipped."""
+        return data_layer.get_customers_by_ids(customer_ids)
+
+    @mcp.tool()
+    async def get_orders_by_ids(order_ids: BatchIds) -> list[Order]:
+        """Gets details of several orders by their IDs in one call. Unknown IDs are skipped."""
+        return data_layer.get_orders_by_ids(order_ids)
+
+    @mcp.tool()
+    async def get_inventory_by_product_ids(product_ids: BatchIds) -> list[ProductInventory]:
+        """Gets inventory details of several products by their IDs in one call"""
+        return data_layer.get_inventory_by_product_ids(product_ids)
+
+    @mcp.resource("resource://inventory/{product_id}/productinventory")
+    async def get_inventory_by_product_id(product_id: str) -> list[ProductInventory]:
+        """Gets inventory details by product ID"""
+        return data_layer.get_inventory_by_product_id(product_id)
+
+    @mcp.tool()
+    @mcp.resource("resource://inventory/{product_id}/stock")
+    async def get_stock_by_product_id(product_id: str) -> ProductStock:
+        """Gets the total stock and the stock per location by product ID"""
+        return data_layer.get_stock_by_product_id(product_id)
+
+    @mcp.tool()
+    @mcp.resource("resource://inventory/stock")
+    async def get_all_stock() -> list[ProductStock]:
+        """Gets the total stock and the stock per location of all products"""
+        return data_layer.get_all_stock()
+
+    @mcp.tool()
+    @mcp.resource("resource://orders/{order_id}/locations")
+    async def get_locations_for_order(order_id: str) -> list[str]:
+        """Gets the inventory locations that can fill an order on their own"""
+        return data_layer.get_locations_for_order(order_id)
+
+    @mcp.resource("resource://inventory/{customer_name}/location")
+    async def get_closest_inventory_location(customer_name: str) -> str:
+        """Gets the closest inventory location based on customer name"""
+        customer_details = data_layer.get_customer_by_name(customer_name)
+        if customer_details is None:
+            return "Customer location unknown"
+
+        if "Germany" in customer_details.address:
+            return "EuropeWest"
+        elif "IL" in customer_details.address:
+            return "USEast"
+        else:
+            return "EuropeWest"
+
+    return mcp
+
+def create_http_app(mcp: FastMCP, sse: bool = True, streamable_http: bool = True) -> Starlette:
+    """
+    Creates one app that serves the MCP server on SSE (/sse and /messages/) and on streamable HTTP (/mcp).
+    :param mcp (FastMCP): The MCP server.
+    :param sse (bool): Whether to serve the SSE transport.
+    :param streamable_http (bool): Whether to serve the streamable HTTP transport.
+    :return: The app.
+    :rtype: Starlette
+    """
+    routes = []
+    http_app = None
+    if sse:
+        routes.extend(mcp.http_app(path="/sse", transport="sse").routes)
+    if streamable_http:
+        http_app = mcp.http_app(path="/mcp", transport="streamable-http")
+        routes.extend(http_app.routes)
+
+    # The streamable HTTP session manager runs in the lifespan of its app, the SSE app has none
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        if http_app is None:
+            yield
+            return
+        async with http_app.router.lifespan_context(app):
+            yield
+
+    return Starlette(routes=routes, lifespan=lifespan)
+
+async def run_stdio(mcp: FastMCP, stdout: TextIO):
+    """
+    Serves the MCP server on stdin and the given stdout until stdin is closed.
+    The caller can point sys.stdout somewhere else, so that prints and logs do not corrupt the protocol.
+    :param mcp (FastMCP): The MCP server.
+    :param stdout (TextIO): The stream the protocol messages are written to, usually the original sys.stdout.
+    """
+    protocol_stdout = anyio.wrap_file(TextIOWrapper(stdout.buffer, encoding="utf-8"))
+    async with stdio_server(stdout=protocol_stdout) as (read_stream, write_stream):
+        server = mcp._mcp_server
+        await server.run(read_stream, write_stream, server.create_initialization_options(NotificationOptions(tools_changed=True)))
+
+async def check_mcp(mcp: FastMCP):
+    # List the components that were created
+    tools = await mcp.get_tools()
+    resources = await mcp.get_resources()
+    templates = await mcp.get_resource_templates()
+
+    print(
+        f"{len(tools)} Tool(s): {', '.join([t.name for t in tools.values()])}"
+    )
+    print(
+        f"{len(resources)} Resource(s): {', '.join([r.name for r in resources.values()])}"
+    )
+    print(
+        f"{len(templates)} Resource Template(s): {', '.join([t.name for t in templates.values()])}"
+    )
+
+    return mcp
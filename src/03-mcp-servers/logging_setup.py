@@ -0,0 +1,132 @@
+import logging
+import os
+import sys
+import threading
+from collections import deque
+
+class BufferedLogHandler(logging.Handler):
+    """
+    Queues log records in memory and lets a background thread format and write them in batches,
+    so a request never formats a message or waits for the output stream. The thread wakes every
+    interval seconds and writes everything queued since with a single write and flush.
+    When max_records are waiting, new records below WARNING are dropped instead of blocking and counted in dropped,
+    the next batch reports the total. Warnings and errors are never dropped: the calling thread writes
+    the queue out itself and queues them then.
+    """
+
+    def __init__(self, stream, max_records: int = 10000, interval: float = 0.1):
+        super().__init__()
+        self.stream = stream
+        self.max_records = max_records
+        self.interval = interval
+        self.records = deque()
+        self.dropped = 0
+        self.reported = 0
+        self.drop_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # Skips the handler lock of the base class, deque appends are thread safe
+        if not self.filter(record):
+            return False
+        self.emit(record)
+        return True
+
+    def emit(self, record: logging.LogRecord):
+        if len(self.records) >= self.max_records:
+            if record.levelno < logging.WARNING:
+                with self.drop_lock:
+                    self.dropped += 1
+                return
+            # Written out first, so the record keeps its place after the queued ones
+            self.flush()
+        self.records.append(record)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        # Also called by logging.shutdown at exit, the lock keeps the batches in order
+        with self.lock:
+            lines = []
+            records = self.records
+            while records:
+                record = records.popleft()
+                try:
+                    lines.append(self.format(record))
+                except Exception:
+                    self.handleError(record)
+            dropped = self.dropped
+            if dropped != self.reported:
+                lines.append(f"Dropped {dropped - self.reported} log records because the log queue was full, {dropped} in total")
+                self.reported = dropped
+            if lines:
+                self.stream.write("\n".join(lines) + "\n")
+                self.stream.flush()
+
+    def close(self):
+        if not self.stop_event.is_set():
+            self.stop_event.set()
+            self.thread.join()
+            self.flush()
+        super().close()
+
+class AccessLogSampler(logging.Filter):
+    """
+    Keeps one in every round(1 / rate) uvicorn access log records of successful requests.
+    Requests that failed with a 4xx or 5xx status are always logged.
+    """
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else 0
+        self.count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        args = record.args
+        # uvicorn logs (client, method, path, http version, status)
+        if isinstance(args, tuple) and len(args) == 5 and isinstance(args[4], int) and args[4] >= 400:
+            return True
+        if self.every == 0:
+            return False
+        self.count += 1
+        return self.count % self.every == 0
+
+_configured = False
+
+def configure_logging(name: str) -> logging.Logger:
+    """
+    Configures logging for the process on the first call and returns the named logger.
+    Records, including the uvicorn server and access logs, are written to stdout.
+    It is configured with environment variables:
+    LOG_LEVEL (default INFO), LOG_QUEUE_SIZE (default 0, which writes synchronously in the calling thread,
+    a positive size queues up to that many records for a background writer, see BufferedLogHandler)
+    and ACCESS_LOG_SAMPLE, the fraction of successful requests that get an access log line (default 1, 0 for none).
+    Run uvicorn with log_config=None, otherwise it replaces the uvicorn logger configuration on startup.
+    :param name (str): The name of the logger.
+    :return: The logger.
+    :rtype: logging.Logger
+    """
+    global _configured
+    if not _configured:
+        _configured = True
+        queue_size = int(os.getenv("LOG_QUEUE_SIZE", "0"))
+        if queue_size > 0:
+            # Closed by logging.shutdown at exit, which writes the records still queued
+            handler = BufferedLogHandler(sys.stdout, queue_size)
+        else:
+            handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        root = logging.getLogger()
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        root.handlers = [handler]
+        for uvicorn_name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+            uvicorn_logger = logging.getLogger(uvicorn_name)
+            uvicorn_logger.handlers = []
+            uvicorn_logger.propagate = True
+            uvicorn_logger.setLevel(logging.NOTSET)
+        logging.getLogger("uvicorn.access").addFilter(AccessLogSampler(float(os.getenv("ACCESS_LOG_SAMPLE", "1"))))
+    return logging.getLogger(name)
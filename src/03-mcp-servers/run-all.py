@@ -1,34 +1,184 @@
-import logging
-import sys
+import http.client
 import os
-import asyncio
-import uvicorn
-from uvicorn import Server, Config
-
-class SSEServer(Server):
-    async def run(self, sockets=None):
-        self.config.setup_event_loop()
-        return await self.serve(sockets=sockets)
-
-configList = [
-    {"port": 8000, "script": "server-mcp-sse:sse_app"},
-    {"port": 8001, "script": "server-openapi:app"},
-    {"port": 8002, "script": "server-mcp-http:http_app"},
-]
-
-async def run():
-    apps = []
-    for cfg in configList:
-        config = Config(cfg["script"], host="0.0.0.0",
-                        port=cfg["port"])
-        server = SSEServer(config=config)
-        apps.append(server.run())
-    return await asyncio.gather(*apps)
+import signal
+import subprocess
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+
+from data_functions import prepare_shared_data
+
+# Supervises the servers: every app runs in its own process group through run-workers.py, so a busy
+# server cannot stall the others and each one can use its own cores. Apps that exit or stop answering
+# health checks are restarted with a growing delay. Ctrl+C or SIGTERM shuts all of them down gracefully.
+#
+#   python run-all.py
+#
+# SSE sessions are bound to one process, so the SSE server always runs with a single worker.
+
+HEALTH_INTERVAL = 5.0
+HEALTH_TIMEOUT = 2.0
+HEALTH_FAILURES = 3
+# Loading the data can take a while on a cold start
+STARTUP_GRACE = 30.0
+SHUTDOWN_TIMEOUT = 10.0
+MAX_RESTART_DELAY = 60.0
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+def workers_from_env(name: str) -> int:
+    """
+    Reads a worker count from the environment.
+    :param name (str): The name of the variable, it defaults to 1 worker.
+    :return: The worker count.
+    :rtype: int
+    """
+    value = os.getenv(name, "1")
+    try:
+        workers = int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a whole number of workers, got {value!r}")
+    if workers < 1:
+        raise ValueError(f"{name} must be at least 1, got {workers}")
+    return workers
+
+def config_list() -> list[dict]:
+    """
+    Lists the supervised apps. Call it after load_dotenv(), so the worker counts from .env apply.
+    :return: The port, script and worker count of every app.
+    :rtype: list[dict]
+    """
+    return [
+        {"port": 8000, "script": "server-mcp-sse-customers:sse_app", "workers": 1},
+        {"port": 8001, "script": "server-openapi:app", "workers": workers_from_env("OPENAPI_WORKERS")},
+        {"port": 8002, "script": "server-mcp-http:http_app", "workers": workers_from_env("MCP_HTTP_WORKERS")},
+    ]
+
+class App:
+    """One supervised app: a run-workers.py process and the uvicorn workers it starts."""
+
+    def __init__(self, script: str, port: int, workers: int, health_path: str = "/"):
+        self.script = script
+        self.port = port
+        self.workers = workers
+        self.health_path = health_path
+        self.process = None
+        self.started = 0.0
+        self.next_check = 0.0
+        self.failures = 0
+        self.restart_delay = 1.0
+        self.restart_at = 0.0
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "run-workers.py", self.script, "--port", str(self.port), "--workers", str(self.workers)],
+            cwd=script_dir,
+            # Its own process group, so the workers can be stopped together and Ctrl+C only reaches the supervisor
+            start_new_session=True,
+        )
+        self.started = time.monotonic()
+        self.next_check = self.started + STARTUP_GRACE
+        self.failures = 0
+        print(f"Started {self.script} on port {self.port} with {self.workers} workers, pid {self.process.pid}")
+
+    def healthy(self) -> bool:
+        """
+        Checks that the app answers an HTTP request. Any response counts, a 404 also proves that the event loop is responsive.
+        :return: True if the app answered within HEALTH_TIMEOUT without a server error.
+        :rtype: bool
+        """
+        connection = http.client.HTTPConnection("localhost", self.port, timeout=HEALTH_TIMEOUT)
+        try:
+            connection.request("GET", self.health_path)
+            return connection.getresponse().status < 500
+        except (OSError, http.client.HTTPException):
+            return False
+        finally:
+            connection.close()
+
+    def supervise(self, now: float):
+        """
+        Starts the app when its restart is due, restarts it when it exited and runs the health check when it is due.
+        :param now (float): The current time.monotonic().
+        """
+        if self.process is None:
+            if now >= self.restart_at:
+                self.start()
+            return
+        code = self.process.poll()
+        if code is not None:
+            print(f"{self.script} exited with code {code}")
+            self.kill_group()
+            self.schedule_restart(now)
+            return
+        if now < self.next_check:
+            return
+        self.next_check = now + HEALTH_INTERVAL
+        if self.healthy():
+            self.failures = 0
+            self.restart_delay = 1.0
+            return
+        self.failures += 1
+        print(f"{self.script} failed health check {self.failures} of {HEALTH_FAILURES}")
+        if self.failures >= HEALTH_FAILURES:
+            self.terminate()
+            self.wait(time.monotonic() + SHUTDOWN_TIMEOUT)
+            self.schedule_restart(now)
+
+    def schedule_restart(self, now: float):
+        print(f"Restarting {self.script} in {self.restart_delay:.0f}s")
+        self.process = None
+        self.restart_at = now + self.restart_delay
+        self.restart_delay = min(self.restart_delay * 2, MAX_RESTART_DELAY)
+
+    def terminate(self):
+        # uvicorn shuts down gracefully on SIGTERM, finishing open requests and stopping its workers
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+    def wait(self, deadline: float):
+        if self.process is None:
+            return
+        try:
+            self.process.wait(max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            print(f"{self.script} did not stop within {SHUTDOWN_TIMEOUT:.0f}s, killing it")
+        self.kill_group()
+
+    def kill_group(self):
+        # Workers left behind by a crashed or hanging supervisor process
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        self.process.wait()
+
+def run(apps: list[App]):
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    while not stop_event.is_set():
+        now = time.monotonic()
+        for app in apps:
+            app.supervise(now)
+        stop_event.wait(0.5)
+
+    print("Shutting down")
+    for app in apps:
+        app.terminate()
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    for app in apps:
+        app.wait(deadline)
 
 if __name__ == "__main__":
+    load_dotenv()
     try:
-        loop = asyncio.new_event_loop()
-        loop.run_until_complete(run())
-    except Exception as e:
-        print(e)
-        sys.exit(0)
\ No newline at end of file
+        configList = config_list()
+    except ValueError as e:
+        sys.exit(f"Invalid configuration: {e}")
+    # Written once up front instead of by every app at the same time
+    prepare_shared_data(os.path.join(script_dir, "data"))
+    # The apps keep their own copy of the orders and exchange updates through the shared order log
+    os.environ["SHARED_ORDER_LOG"] = "true"
+    run([App(cfg["script"], cfg["port"], cfg["workers"], cfg.get("health", "/")) for cfg in configList])
@@ -11,7 +11,7 @@ class SSEServer(Server):
         return await self.serve(sockets=sockets)
 
 configList = [
-    {"port": 8000, "script": "server-mcp-sse-customers:sse_app"}
+    {"port": 8000, "script": "server-mcp-ecommerce:app"}
 ]
 
 async def run():
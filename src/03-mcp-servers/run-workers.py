@@ -0,0 +1,54 @@
+import argparse
+import os
+import socket
+import sys
+from dotenv import load_dotenv
+from uvicorn import Config, Server
+from uvicorn.supervisors import Multiprocess
+
+from data_functions import prepare_shared_data
+
+# Serves one of the e-commerce apps with several worker processes that share one listening socket:
+#
+#   python run-workers.py server-openapi:app --port 8000 --workers 4
+#
+# The workers map the same data snapshot (DATA_BACKEND defaults to mapped) and exchange order updates
+# through a shared order log, see load_data_layer. SSE sessions are bound to the process that opened
+# them, so the SSE servers run with one worker; use server-mcp-http:http_app to scale MCP traffic.
+
+SSE_APPS = ["server-mcp-sse-customers:sse_app", "server-mcp-sse-time:sse_app", "server-mcp-ecommerce:app"]
+
+def run_workers(app: str, port: int, workers: int):
+    if workers > 1 and app in SSE_APPS:
+        raise ValueError(f"{app} keeps its SSE sessions in memory and cannot run with several workers")
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    # Inherited by the workers, which load their data layer when they import the app
+    os.environ["SERVER_WORKERS"] = str(workers)
+    if workers > 1:
+        os.environ.setdefault("DATA_BACKEND", "mapped")
+        os.environ["SHARED_ORDER_LOG"] = "true"
+    prepare_shared_data(os.path.join(script_dir, "data"))
+    config = Config(app, host="0.0.0.0", port=port, workers=workers)
+    server = Server(config=config)
+    if workers == 1:
+        server.run()
+        return
+    sock = config.bind_socket()
+    # The workers receive the socket without its protocol number, so asyncio does not disable Nagle's
+    # algorithm on their connections and responses wait for delayed ACKs of about 40 ms.
+    # Connections inherit the option from the listening socket instead.
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    Multiprocess(config, target=server.run, sockets=[sock]).run()
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("app", help="The app to serve, e.g. server-openapi:app or server-mcp-http:http_app")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1))))
+    args = parser.parse_args()
+    try:
+        run_workers(args.app, args.port, args.workers)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
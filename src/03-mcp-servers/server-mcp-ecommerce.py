@@ -0,0 +1,56 @@
+import argparse
+import asyncio
+import os
+import sys
+import uvicorn
+from dotenv import load_dotenv
+
+from data_functions import load_data_layer
+from ecommerce_mcp import create_mcp, create_http_app, check_mcp, run_stdio
+
+# Serves the e-commerce MCP server on SSE, streamable HTTP and stdio from one process, so all
+# transports share one data layer and its caches instead of loading the data once per server:
+#
+#   python server-mcp-ecommerce.py --port 8000 --stdio
+#
+# SSE is served on /sse, streamable HTTP on /mcp. With --stdio the process also answers on stdin
+# and stdout, for clients that start it as a subprocess, and exits when stdin is closed.
+
+# stdout may carry the stdio protocol, everything the data layer, the tools and uvicorn print goes to stderr then
+protocol_stdout = sys.stdout
+if "--stdio" in sys.argv:
+    sys.stdout = sys.stderr
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_path = os.path.join(script_dir, "data")
+load_dotenv()
+data_layer = load_data_layer(data_path)
+
+mcp = create_mcp(data_layer)
+
+# For run-workers.py, which serves it with a single worker because of the SSE sessions
+app = create_http_app(mcp)
+
+async def serve(port: int, stdio: bool):
+    server = uvicorn.Server(uvicorn.Config(app, host="0.0.0.0", port=port))
+    if not stdio:
+        await server.serve()
+        return
+    http_task = asyncio.create_task(server.serve())
+    try:
+        await run_stdio(mcp, protocol_stdout)
+    finally:
+        # The stdio client is gone, take the HTTP transports down with it
+        server.should_exit = True
+        await http_task
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--stdio", action="store_true", help="Also serve on stdin and stdout")
+    args = parser.parse_args()
+    try:
+        asyncio.run(check_mcp(mcp))
+        asyncio.run(serve(args.port, args.stdio))
+    except KeyboardInterrupt:
+        print("\nProgram interrupted by user. Cleaning up...")
@@ -1,26 +1,26 @@
-import logging
 import sys
 import os
 import asyncio
+import hashlib
 from dotenv import load_dotenv
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Request
 from fastapi.openapi.utils import get_openapi
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
 
-from data_functions import DataLayer
-from data_functions import Discount, Product, Order, Supplier, Customer, ProductInventory, Message
-
-data_layer = DataLayer()
-data_layer.load_order_from_json("data/orders.json")
-data_layer.load_supplier_from_json("data/suppliers.json")
-data_layer.load_customer_from_json("data/customers.json")
-data_layer.load_inventory_from_json("data/inventory.json")
+from data_functions import load_data_layer
+from logging_setup import configure_logging
+from response_encoding import EncodingMiddleware, CACHED_LEVELS, JSON_TYPE, MSGPACK_TYPES, choose_content_encoding, compress, json_to_msgpack, wants_msgpack
+from data_functions import Discount, Product, Order, Supplier, Customer, CustomerMatch, ProductInventory, ProductStock, CatalogPage, IdBatch, Message
 
 load_dotenv()
 
+script_dir = os.path.dirname(os.path.abspath(__file__))
+data_layer = load_data_layer(os.path.join(script_dir, "data"))
+
 app = FastAPI()
 
 origins = [
@@ -37,6 +37,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Bodies smaller than this are sent uncompressed
+compression_min_size = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+app.add_middleware(EncodingMiddleware, minimum_size=compression_min_size)
+
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
@@ -55,90 +59,187 @@ def custom_openapi():
     app.openapi_schema = openapi_schema
     return app.openapi_schema
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger("webhost")
+logger = configure_logging("webhost")
+
+# Encoded bodies keyed by route and params, valid for one data version. Each entry holds the
+# ETag of the JSON body and every representation built so far, keyed by media type and content encoding.
+response_cache: dict[tuple, tuple[int, str, dict[tuple[str, str | None], bytes]]] = {}
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+def cached_json_response(request: Request, key: tuple, adapter: TypeAdapter, load_items) -> Response | None:
+    """Returns the cached body for key in the representation the client accepts, encoding it again
+    only when the data has changed. Returns None if load_items yields no items."""
+    version = data_layer.data_version
+    entry = response_cache.get(key)
+    if entry is None or entry[0] != version:
+        items = load_items()
+        if not items:
+            response_cache.pop(key, None)
+            return None
+        body = adapter.dump_json(items)
+        entry = (version, hashlib.sha256(body).hexdigest()[:32], {(JSON_TYPE, None): body})
+        response_cache[key] = entry
+    _, tag, variants = entry
 
-logging.basicConfig(
-    stream=sys.stdout, level=logging.INFO
-) 
+    media_type = MSGPACK_TYPES[0] if wants_msgpack(request.headers.get("accept")) else JSON_TYPE
+    body = variants.get((media_type, None))
+    if body is None:
+        body = variants[(media_type, None)] = json_to_msgpack(variants[(JSON_TYPE, None)])
+    encoding = choose_content_encoding(request.headers.get("accept-encoding")) if len(body) >= compression_min_size else None
+    if encoding is not None:
+        variant = (media_type, encoding)
+        body = variants.get(variant) or variants.setdefault(variant, compress(body, encoding, CACHED_LEVELS))
+        tag += "-" + encoding
+    if media_type != JSON_TYPE:
+        tag += "-msgpack"
+
+    etag = '"' + tag + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+products_adapter = TypeAdapter(list[Product])
+discounts_adapter = TypeAdapter(list[Discount])
+inventory_adapter = TypeAdapter(list[ProductInventory])
+stock_adapter = TypeAdapter(list[ProductStock])
+
+def catalog_page_response(get_page, cursor: str | None, limit: int | None, fields: str | None) -> Response:
+    """Encodes one catalog page. Pages are not cached, their cursors make every request different."""
+    field_list = [field.strip() for field in fields.split(",") if field.strip()] if fields else None
+    try:
+        page = get_page(cursor, max(1, min(limit or 50, 500)), field_list)
+    except ValueError as e:
+        logger.error("Invalid catalog page request: %s", e)
+        return JSONResponse(status_code=400, content={"message": str(e)})
+    return Response(content=page.model_dump_json(), media_type="application/json")
 
 @app.get("/customers/id/{customer_id}", operation_id="get_customer_by_id", responses={404: {"model": Message}})
 async def get_customer_by_id(customer_id: str) -> Customer:
     """Get customer by ID"""
     item = data_layer.get_customer_by_id(customer_id)
     if item is None:
-        logger.error(f"Customer with ID {customer_id} not found")
+        logger.error("Customer with ID %s not found", customer_id)
         return JSONResponse(
             status_code=404,
             content={"message": f"Customer with ID {customer_id} not found"},
         )
-    logger.info(f"Customer with ID {customer_id} found")
+    logger.debug("Customer with ID %s found", customer_id)
     return item
 
+@app.post("/customers/batch", operation_id="get_customers_by_ids")
+async def get_customers_by_ids(batch: IdBatch) -> list[Customer]:
+    """Get several customers by their IDs in one request. Unknown IDs are skipped."""
+    items = data_layer.get_customers_by_ids(batch.ids)
+    logger.debug("%s of %s customers found", len(items), len(batch.ids))
+    return items
+
 @app.get("/customers/name/{customer_name}", operation_id="get_customer_by_name", responses={404: {"model": Message}})
 async def get_customer_by_name(customer_name: str) -> Customer:
     """Get customer by name"""
     item = data_layer.get_customer_by_name(customer_name)
     if item is None:
-        logger.error(f"Customer with name {customer_name} not found")
+        logger.error("Customer with name %s not found", customer_name)
         return JSONResponse(
             status_code=404,
             content={"message": f"Customer with name {customer_name} not found"},
         )
-    logger.info(f"Customer with name {customer_name} found")
+    logger.debug("Customer with name %s found", customer_name)
     return item
 
-@app.get("/products/all", operation_id="get_all_products", responses={404: {"model": Message}})
-async def get_all_products() -> list[Product]:
-    """Get all products"""
-    items = data_layer.get_all_products()
-    if not items:
+@app.get("/customers/search", operation_id="search_customers")
+async def search_customers(query: str, limit: int = 10) -> list[CustomerMatch]:
+    """Search customers by a full or partial name, ignoring case and small typos. Best matches come first."""
+    items = data_layer.search_customers(query, max(1, min(limit, 100)))
+    logger.debug("%s customers match %s", len(items), query)
+    return items
+
+@app.get("/products/all", operation_id="get_all_products", responses={400: {"model": Message}, 404: {"model": Message}})
+async def get_all_products(request: Request, cursor: str | None = None, limit: int | None = None, fields: str | None = None) -> list[Product] | CatalogPage:
+    """Get all products. Pass limit, cursor (next_cursor of the previous page) or fields (comma separated,
+    e.g. product_id,list_price) to get one page of products with only those fields instead."""
+    if cursor is not None or limit is not None or fields is not None:
+        return catalog_page_response(data_layer.get_products_page, cursor, limit, fields)
+    response = cached_json_response(request, ("products",), products_adapter, data_layer.get_all_products)
+    if response is None:
         logger.error("No products found")
         return JSONResponse(
             status_code=404,
             content={"message": "No products found"},
         )
-    logger.info(f"{len(items)} products found")
-    return items
+    logger.debug("Products found")
+    return response
 
-@app.get("/discounts/all", operation_id="get_all_discounts", responses={404: {"model": Message}})
-async def get_all_discounts() -> list[Discount]:
-    """Get all discounts"""
-    items = data_layer.get_all_discounts()
-    if not items:
+@app.get("/discounts/all", operation_id="get_all_discounts", responses={400: {"model": Message}, 404: {"model": Message}})
+async def get_all_discounts(request: Request, cursor: str | None = None, limit: int | None = None, fields: str | None = None) -> list[Discount] | CatalogPage:
+    """Get all discounts. Pass limit, cursor (next_cursor of the previous page) or fields (comma separated,
+    e.g. discount_id,discount_price) to get one page of discounts with only those fields instead."""
+    if cursor is not None or limit is not None or fields is not None:
+        return catalog_page_response(data_layer.get_discounts_page, cursor, limit, fields)
+    response = cached_json_response(request, ("discounts",), discounts_adapter, data_layer.get_all_discounts)
+    if response is None:
         logger.error("No discounts found")
         return JSONResponse(
             status_code=404,
             content={"message": "No discounts found"},
         )
-    logger.info(f"{len(items)} discounts found")
-    return items
+    logger.debug("Discounts found")
+    return response
 
 @app.get("/orders/id/{order_id}", operation_id="get_order_by_id", responses={404: {"model": Message}})
 async def get_order_by_id(order_id: str) -> Order:
     """Get order by ID"""
     item = data_layer.get_order_by_id(order_id)
     if item is None:
-        logger.error(f"Order with ID {order_id} not found")
+        logger.error("Order with ID %s not found", order_id)
         return JSONResponse(
             status_code=404,
             content={"message": f"Order with ID {order_id} not found"},
         )
-    logger.info(f"Order with ID {order_id} found")
+    logger.debug("Order with ID %s found", order_id)
     return item
 
+@app.post("/orders/batch", operation_id="get_orders_by_ids")
+async def get_orders_by_ids(batch: IdBatch) -> list[Order]:
+    """Get several orders by their IDs in one request. Unknown IDs are skipped."""
+    items = data_layer.get_orders_by_ids(batch.ids)
+    logger.debug("%s of %s orders found", len(items), len(batch.ids))
+    return items
+
+@app.get("/orders/customer/{customer_id}", operation_id="get_orders_by_customer_id", responses={404: {"model": Message}})
+async def get_orders_by_customer_id(customer_id: str, offset: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=500)) -> list[Order]:
+    """Get a page of orders by customer ID"""
+    items = data_layer.get_orders_by_customer_id_page(customer_id, offset, limit)
+    if not items:
+        logger.error("No orders found for customer ID %s", customer_id)
+        return JSONResponse(
+            status_code=404,
+            content={"message": f"No orders found for customer ID {customer_id}"},
+        )
+    logger.debug("%s orders found for customer ID %s", len(items), customer_id)
+    return items
+
 @app.post("/order/update", operation_id="update_order", responses={404: {"model": Message}})
 async def update_order(order: Order) -> bool:
     """Update existing order"""
-    logger.info(f"Received order update for order ID: {order.order_id}")
+    logger.info("Received order update for order ID: %s", order.order_id)
     updated = data_layer.update_order(order.order_id, order)
     if not updated:
-        logger.error(f"Order with ID {order.order_id} not found for update")
+        logger.error("Order with ID %s not found for update", order.order_id)
         return JSONResponse(
             status_code=404,
             content={"message": f"Order with ID {order.order_id} not found for update"},
         )
-    logger.info(f"Order with ID {order.order_id} updated")
+    logger.info("Order with ID %s updated", order.order_id)
     return updated
 
 @app.get("/get_closest_inventory_location/{customer_name}", operation_id="get_closest_inventory_location", responses={404: {"model": Message}})
@@ -146,7 +247,7 @@ async def get_closest_inventory_location(customer_name: str) -> str:
     """Get closest inventory location based on customer name"""
     customer_details = data_layer.get_customer_by_name(customer_name)
     if customer_details is None:
-        logger.error(f"Customer with name {customer_name} not found")
+        logger.error("Customer with name %s not found", customer_name)
         return "EuropeWest"
     if "Germany" in customer_details.address:
         return "EuropeWest"
@@ -156,23 +257,73 @@ async def get_closest_inventory_location(customer_name: str) -> str:
         return "EuropeWest"
 
 @app.get("/inventory/{product_id}", operation_id="get_inventory_by_product_id", responses={404: {"model": Message}})
-async def get_inventory_by_product_id(product_id: str) -> list[ProductInventory]:
+async def get_inventory_by_product_id(request: Request, product_id: str) -> list[ProductInventory]:
     """Get available inventory by product ID"""
-    items = data_layer.get_inventory_by_product_id(product_id)
-    if not items:
-        logger.error(f"No inventory found for product ID {product_id}")
+    response = cached_json_response(
+        request, ("inventory", product_id), inventory_adapter,
+        lambda: data_layer.get_inventory_by_product_id(product_id),
+    )
+    if response is None:
+        logger.error("No inventory found for product ID %s", product_id)
         return JSONResponse(
             status_code=404,
             content={"message": f"No inventory found for product ID {product_id}"},
         )
-    logger.info(f"Inventory found for product ID {product_id}")
+    logger.debug("Inventory found for product ID %s", product_id)
+    return response
+
+@app.post("/inventory/batch", operation_id="get_inventory_by_product_ids")
+async def get_inventory_by_product_ids(batch: IdBatch) -> list[ProductInventory]:
+    """Get available inventory of several products by their IDs in one request"""
+    items = data_layer.get_inventory_by_product_ids(batch.ids)
+    logger.debug("%s inventory items found for %s products", len(items), len(batch.ids))
     return items
 
+@app.get("/inventory/{product_id}/stock", operation_id="get_stock_by_product_id", responses={404: {"model": Message}})
+async def get_stock_by_product_id(product_id: str) -> ProductStock:
+    """Get total stock and stock per location by product ID"""
+    item = data_layer.get_stock_by_product_id(product_id)
+    if item is None:
+        logger.error("No stock found for product ID %s", product_id)
+        return JSONResponse(
+            status_code=404,
+            content={"message": f"No stock found for product ID {product_id}"},
+        )
+    logger.debug("Stock found for product ID %s", product_id)
+    return item
+
+@app.get("/stock/all", operation_id="get_all_stock", responses={404: {"model": Message}})
+async def get_all_stock(request: Request) -> list[ProductStock]:
+    """Get total stock and stock per location of all products"""
+    response = cached_json_response(request, ("stock",), stock_adapter, data_layer.get_all_stock)
+    if response is None:
+        logger.error("No stock found")
+        return JSONResponse(
+            status_code=404,
+            content={"message": "No stock found"},
+        )
+    logger.debug("Stock found")
+    return response
+
+@app.get("/orders/id/{order_id}/locations", operation_id="get_locations_for_order", responses={404: {"model": Message}})
+async def get_locations_for_order(order_id: str) -> list[str]:
+    """Get the inventory locations that can fill an order on their own"""
+    locations = data_layer.get_locations_for_order(order_id)
+    if locations is None:
+        logger.error("Order with ID %s not found", order_id)
+        return JSONResponse(
+            status_code=404,
+            content={"message": f"Order with ID {order_id} not found"},
+        )
+    logger.debug("%s locations can fill order ID %s", len(locations), order_id)
+    return locations
+
 app.openapi = custom_openapi
 
 if __name__ == "__main__":
     try:
-        uvicorn.run(app, host="0.0.0.0", port=8000)
+        # Keeps the uvicorn loggers on the queue set up by configure_logging
+        uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
     except Exception as e:
         print(e)
         sys.exit(0)
\ No newline at end of file
@@ -0,0 +1,154 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from data_functions import DataLayer, Order, Product
+from data_columnar import ColumnarDataLayer
+from data_sqlite import SqliteDataLayer
+from data_mapped import MappedDataLayer, write_snapshot
+
+# Hammers one DataLayer with concurrent readers and update_order writers and checks
+# that readers never fail and never see a half applied update.
+# Every write stamps the same marker into several fields of an order, so a torn read
+# shows up as an order whose fields disagree.
+#
+#   python stress-data-layer.py --seconds 10 --readers 8 --writers 2
+
+CUSTOMERS = 20
+
+def generate_orders(count: int) -> list[Order]:
+    return [
+        Order(
+            customer_id=f"CUST{i % CUSTOMERS}",
+            order_id=f"ORD-{i}",
+            order_date="2023-10-01",
+            order_status="M0",
+            fill_date="M0",
+            fill_strategy="M0",
+            order_items=[
+                Product(
+                    product_id=f"PROD{j}",
+                    product_name=f"Product {j}",
+                    list_price=10.0 + j,
+                    description=f"Description for Product {j}",
+                    features=["M0"]
+                ) for j in range(3)
+            ]
+        ) for i in range(count)
+    ]
+
+def check_order(order: Order, customer_id: str = None):
+    marker = order.order_status
+    if order.fill_date != marker or order.fill_strategy != marker:
+        raise AssertionError(f"Torn order {order.order_id}: {order.order_status}/{order.fill_date}/{order.fill_strategy}")
+    if any(product.features != [marker] for product in order.order_items):
+        raise AssertionError(f"Torn order items in {order.order_id}")
+    if customer_id is not None and order.customer_id != customer_id:
+        raise AssertionError(f"Order {order.order_id} listed under {customer_id} belongs to {order.customer_id}")
+
+def with_orders(data_layer: DataLayer, args) -> DataLayer:
+    data_layer.orders = generate_orders(args.orders)
+    data_layer.rebuild_indexes()
+    return data_layer
+
+def mapped_data_layer(snapshot_file: str, args) -> MappedDataLayer:
+    write_snapshot(with_orders(DataLayer(), args), snapshot_file)
+    return MappedDataLayer(snapshot_file=snapshot_file)
+
+def run(data_layer: DataLayer, args) -> dict:
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0}
+    errors = []
+
+    def reader(seed: int):
+        rng = random.Random(seed)
+        reads = 0
+        try:
+            while not stop.is_set():
+                order = data_layer.get_order_by_id(f"ORD-{rng.randrange(args.orders)}")
+                if order is None:
+                    raise AssertionError("Order disappeared")
+                check_order(order)
+                customer_id = f"CUST{rng.randrange(CUSTOMERS)}"
+                for order in data_layer.iter_orders_by_customer_id(customer_id):
+                    check_order(order, customer_id)
+                for order in data_layer.get_orders_by_customer_id_page(customer_id, rng.randrange(10), 10):
+                    check_order(order, customer_id)
+                reads += 3
+        except Exception as e:
+            errors.append(e)
+        counts["reads"] += reads
+
+    def writer(seed: int):
+        rng = random.Random(seed)
+        writes = 0
+        try:
+            while not stop.is_set():
+                order = data_layer.get_order_by_id(f"ORD-{rng.randrange(args.orders)}")
+                marker = f"M{seed}-{writes}"
+                items = [product.model_copy(update={"features": [marker]}) for product in order.order_items]
+                updated = order.model_copy(update={
+                    "order_status": marker,
+                    "fill_date": marker,
+                    "fill_strategy": marker,
+                    "customer_id": f"CUST{rng.randrange(CUSTOMERS)}",
+                    "order_items": items[:rng.randrange(1, len(items) + 1)] if rng.random() < 0.5 else items,
+                })
+                if not data_layer.update_order(order.order_id, updated):
+                    raise AssertionError(f"Update of {order.order_id} failed")
+                writes += 1
+        except Exception as e:
+            errors.append(e)
+        counts["writes"] += writes
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    # After the run the indexes must agree with the stored orders
+    orders = {order.order_id: order for order in data_layer.orders}
+    if len(orders) != args.orders:
+        errors.append(AssertionError(f"Expected {args.orders} orders, found {len(orders)}"))
+    for i in range(CUSTOMERS):
+        customer_id = f"CUST{i}"
+        indexed = {order.order_id for order in data_layer.get_orders_by_customer_id(customer_id)}
+        stored = {order_id for order_id, order in orders.items() if order.customer_id == customer_id}
+        if indexed != stored:
+            errors.append(AssertionError(f"Customer index of {customer_id} is out of sync"))
+    return {"counts": counts, "errors": errors}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--orders", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Switch threads often to make interleavings likely
+    sys.setswitchinterval(1e-6)
+    failed = False
+    tmp = tempfile.TemporaryDirectory()
+    backends = [
+        with_orders(DataLayer(), args),
+        with_orders(ColumnarDataLayer(), args),
+        with_orders(SqliteDataLayer(database_file=os.path.join(tmp.name, "stress.db")), args),
+        mapped_data_layer(os.path.join(tmp.name, "stress.snapshot"), args),
+    ]
+    for data_layer in backends:
+        result = run(data_layer, args)
+        counts = result["counts"]
+        print(f"{type(data_layer).__name__}: {counts['reads']} reads, {counts['writes']} writes, {len(result['errors'])} errors")
+        for error in result["errors"][:5]:
+            print(f"  {error!r}")
+        failed = failed or bool(result["errors"])
+    sys.exit(1 if failed else 0)